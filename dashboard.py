@@ -1,10 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from handlers.dashboard_strategy import GetExamDashboardCache, GetCourseDashboardCache
 from handlers.dashboard_interface import Context
+from queries.dashboard_summary_queries import apply_dashboard_changes, EXAM_MV_SOURCES, COURSE_CACHE_SOURCES
 from utils.logger import logger
 from utils.redis_client import redis_client
+from utils.encoded_body import conditional_response
 
 router = APIRouter()
 TIMER_KEY = 'dashboard:refresh_timer'
@@ -12,7 +14,7 @@ INTERVAL_SECONDS = 600  # 10 minutes
 
 # System Section 
 @router.get("/load-system")
-def initial_load():
+async def initial_load():
     # Check redis if it cached
     # if yes give that cached data
     # if not build it then give it
@@ -22,65 +24,65 @@ def initial_load():
 
 # Exam Section
 @router.get("/load-exam")
-def initial_load_exam():
+async def initial_load_exam(request: Request):
     # Check redis if it cached
     # if yes give that cached data
     # if not build it then give it
     # Data: Total exams count, published count, unpublished count, question group by exams, exams group by courses, exams to open this month
     context = Context(GetExamDashboardCache())
-    
-    return context.do_business_logic()
+    entry = await context.do_business_logic_async()
+
+    return conditional_response(request, entry)
 
 # Course Section
 @router.get("/load-course/{course_id}")
-def initial_load_course(course_id: int):
+async def initial_load_course(course_id: int, request: Request):
     # Check redis if it cached
     # if yes give that cached data
     # if not build it then give it
     # Data: Question count, subject count, topic count, exam count for this course, unused question count, reused question count, question group by subject/topic, exam group by reused question
     context = Context(GetCourseDashboardCache(), course_id)
+    entry = await context.do_business_logic_async()
 
-    return context.do_business_logic()
+    return conditional_response(request, entry)
 
 @router.get("/refresh")
 def refresh_dasboard():
-    exam_context = Context(GetExamDashboardCache())
-    exam_context._strategy.refresh()
-    course_context = Context(GetCourseDashboardCache())
-    course_context._strategy.refresh()
+    refresh_dashboard(full=True)
 
     return "refreshed"
 
 
-def refresh_dashboard_job():
-    # Attempt to set the timer only if it doesn't exist
-    success = redis_client.set(TIMER_KEY, 'running', ex=INTERVAL_SECONDS, nx=True)
+def refresh_dashboard(full=False):
+    # apply logged changes to the summary tables, then rebuild only what they made stale
+    changed = apply_dashboard_changes()
+    if full or changed is None:
+        changed = EXAM_MV_SOURCES | COURSE_CACHE_SOURCES
 
-    if success:
-        print("✅ Dashboard refresh started.")
+    if changed & EXAM_MV_SOURCES:
         exam_context = Context(GetExamDashboardCache())
         exam_context._strategy.refresh()
+    if changed & COURSE_CACHE_SOURCES:
         course_context = Context(GetCourseDashboardCache())
         course_context._strategy.refresh()
-        print(f"⏱️ Timer set. TTL is now {INTERVAL_SECONDS} seconds.")
-    else:
-        ttl = redis_client.ttl(TIMER_KEY)
-        if ttl > 0:
-            return(f"⏱️ {ttl} seconds left before next refresh.")
+    if not changed:
+        print("✅ Dashboard unchanged, nothing to refresh.")
 
 
-@router.get("/timer")
-def get_timer_ttl():
+def refresh_dashboard_job(full=False):
+    # Attempt to set the timer only if it doesn't exist
     success = redis_client.set(TIMER_KEY, 'running', ex=INTERVAL_SECONDS, nx=True)
 
     if success:
         print("✅ Dashboard refresh started.")
-        exam_context = Context(GetExamDashboardCache())
-        exam_context._strategy.refresh()
-        course_context = Context(GetCourseDashboardCache())
-        course_context._strategy.refresh()
+        refresh_dashboard(full)
         print(f"⏱️ Timer set. TTL is now {INTERVAL_SECONDS} seconds.")
     else:
         ttl = redis_client.ttl(TIMER_KEY)
         if ttl > 0:
             return(f"⏱️ {ttl} seconds left before next refresh.")
+
+
+@router.get("/timer")
+def get_timer_ttl():
+    return refresh_dashboard_job(full=True)
@@ -1,18 +1,40 @@
 import redis
 import time
-import requests
 import json
 import threading
 import os
+import queue
+import socket
+import signal
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, wait
 from utils.logger import logger
-from queries.exam_taking_queries import update_answer_points, update_exam_record
+from queries.exam_taking_queries import update_answers_points, update_exam_records
 from utils.redis_client import redis_client
+from utils.database_pool import close_db_pool
+from utils.executor_client import ExecutorClient, ExecutorError, StubExecutorClient
+from utils.executor_limits import AdaptiveLimiter, CircuitBreaker, CircuitOpenError
+from utils.executor_result_cache import get_submission_hash, get_cached_result, cache_result, get_result_cache_stats
 
 LOG_SEPARATOR = "-" * 80
 
 STUDENT_CODE_ANSWER_STREAM = "code_checker"
 STUDENT_CODE_ANSWER_GROUP = "async_code_checker"
-STUDENT_CODE_ANSWER_CONSUMER = "checker-1"
+# every worker process joins the group under its own name so pending entries stay traceable
+STUDENT_CODE_ANSWER_CONSUMER = os.getenv("WORKER_CONSUMER_NAME") or f"checker-{socket.gethostname()}-{os.getpid()}"
+STUDENT_CODE_ANSWER_DEAD_LETTER_STREAM = "code_checker:dead"
+# message id -> deliveries deferred because an executor was unavailable, not counted as failures
+STUDENT_CODE_ANSWER_DEFERRALS_HASH = "code_checker:deferrals"
+DEAD_LETTER_MAXLEN = 10000
+
+# Entries pending longer than this (ms) are claimed from their consumer, which is
+# assumed dead. Must stay above the time a slow paper takes to grade.
+WORKER_RECLAIM_IDLE_MS = int(os.getenv("WORKER_RECLAIM_IDLE_MS", 300000))
+WORKER_RECLAIM_INTERVAL_SECONDS = int(os.getenv("WORKER_RECLAIM_INTERVAL_SECONDS", 60))
+# Failed deliveries (parse or write errors, crashes) after which an entry is treated
+# as poison and dead-lettered. Deliveries deferred for an unavailable executor do not count.
+WORKER_MAX_DELIVERIES = int(os.getenv("WORKER_MAX_DELIVERIES", 5))
 
 STUDENT_CODE_ANSWER_UPDATE_HASH = "checked_code"
 CODE_ANSWER_CHECKING = "checking"
@@ -25,6 +47,55 @@ LANGUAGE_EXECUTOR_URLS = {
     # 'cpp': "http://cpp-api:8090/execute" Not implemented yet,
 }
 
+# Upper bound of the adaptive in-flight limit per entry of LANGUAGE_EXECUTOR_URLS
+LANGUAGE_MAX_IN_FLIGHT = {
+    'java': int(os.getenv("JAVA_EXECUTOR_MAX_IN_FLIGHT", 8)),
+}
+DEFAULT_LANGUAGE_MAX_IN_FLIGHT = 4
+
+# Threads calling the executors and papers being graded at the same time
+WORKER_MAX_THREADS = int(os.getenv("WORKER_MAX_THREADS", sum(LANGUAGE_MAX_IN_FLIGHT.values())))
+WORKER_MAX_PAPERS_IN_FLIGHT = int(os.getenv("WORKER_MAX_PAPERS_IN_FLIGHT", 32))
+
+executor_limiters = {
+    url: AdaptiveLimiter(url, LANGUAGE_MAX_IN_FLIGHT.get(language, DEFAULT_LANGUAGE_MAX_IN_FLIGHT))
+    for language, url in LANGUAGE_EXECUTOR_URLS.items()
+}
+executor_breakers = {url: CircuitBreaker(url) for url in LANGUAGE_EXECUTOR_URLS.values()}
+# Built by listen_forever from the sizes it is started with, see build_worker_pools
+code_check_pool = None
+paper_pool = None
+papers_in_flight = None
+
+# Stream entries read per XREADGROUP call (defaults to the papers in flight) and how long (ms) one call may block
+worker_batch_size = None
+WORKER_BLOCK_MS = int(os.getenv("WORKER_BLOCK_MS", 2000))
+# How long the API waits on shutdown for the embedded worker to drain
+WORKER_DRAIN_TIMEOUT_SECONDS = float(os.getenv("WORKER_DRAIN_TIMEOUT_SECONDS", 60))
+
+# Message ids of graded papers, acked together on the next loop iteration
+pending_acks = queue.SimpleQueue()
+# Message ids handed to the paper pool and not finished yet
+in_flight_ids = set()
+in_flight_lock = threading.Lock()
+
+# Papers waiting for their exam record, recomputed together every debounce window.
+# student_paper_id -> message ids acked once its exam record is written
+EXAM_RECORD_DEBOUNCE_SECONDS = float(os.getenv("EXAM_RECORD_DEBOUNCE_SECONDS", 2))
+dirty_papers = {}
+dirty_papers_lock = threading.Lock()
+shutdown_event = threading.Event()
+
+# EXECUTOR_CLIENT=stub grades against a local stub instead of the language executors
+if os.getenv("EXECUTOR_CLIENT") == "stub":
+    executor_client = StubExecutorClient()
+else:
+    executor_client = ExecutorClient(LANGUAGE_EXECUTOR_URLS)
+
+def set_executor_client(client):
+    global executor_client
+    executor_client = client
+
 
 def process_user_code(coding_answer_id, fields):
     redis_client.hset(STUDENT_CODE_ANSWER_UPDATE_HASH, coding_answer_id, CODE_ANSWER_CHECKING)
@@ -40,68 +111,308 @@ def process_user_code(coding_answer_id, fields):
         logger.info("Executing to language executor")
         logger.info(f"This is the fields to send in JSON {data}")
 
-        language_executor_url = LANGUAGE_EXECUTOR_URLS.get(language)
-        if not language_executor_url:
+        if language not in LANGUAGE_EXECUTOR_URLS:
             raise ValueError(f"No executor URL defined for language: {language}")
 
-        response = requests.post(language_executor_url, json=data)
+        # identical submissions to the same executor reuse its result instead of running again
+        result = None
+        if executor_client.cacheable:
+            submission_hash = get_submission_hash(language, LANGUAGE_EXECUTOR_URLS[language], data)
+            result = get_cached_result(submission_hash)
+            if result is not None:
+                logger.info(f"Executor result cache hit for {coding_answer_id}")
 
-        logger.info(LOG_SEPARATOR)
-        logger.info(f"Checking Response : {response}")
-
-        result = response.json()
+        if result is None:
+            result = execute_with_limits(language, data)
+            if executor_client.cacheable:
+                cache_result(submission_hash, result)
 
-        # Save result to DB
+        logger.info(LOG_SEPARATOR)
         logger.info(f"results : {result}")
         logger.info(LOG_SEPARATOR)
 
-        update_answer_points(coding_answer_id, result, answer_id)
+        # Saved to DB together with the rest of the paper
+        return coding_answer_id, result, answer_id
+
+    except (CircuitOpenError, ExecutorError):
+        # executor unavailable, the paper stays pending and is graded later
+        raise
 
     except Exception as e:
         logger.exception(f"[Worker Error] Processing {coding_answer_id} failed")
+        return None
+
+def execute_with_limits(language, data):
+    url = LANGUAGE_EXECUTOR_URLS[language]
+    breaker = executor_breakers[url]
+    limiter = executor_limiters[url]
+
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"Executor {url} circuit is open")
+
+    limiter.acquire()
+    started = time.perf_counter()
+    failed = True
+    try:
+        result = executor_client.execute(language, data)
+        failed = False
+        return result
+    finally:
+        limiter.release(time.perf_counter() - started, failed=failed)
+        if failed:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+def executors_unavailable():
+    # any open breaker, or a half-open one waiting on its probe, pauses reading and
+    # reclaiming; entries wait in the stream instead of failing
+    return any(breaker.is_open() for breaker in executor_breakers.values())
+
+def check_paper(message_id, fields):
+    # grade every coding answer of a paper in parallel, then update its exam record once
+    try:
+        logger.info(LOG_SEPARATOR)
+        logger.info(f"CHECKING USER CODE")
+        raw_json = fields[b'data'].decode()
+        fields_json = json.loads(raw_json)
+        student_paper_id = fields_json[0]['student_paper_id']
+        logger.info(f"Checking paper {student_paper_id}")
+
+        checks = [
+            code_check_pool.submit(process_user_code, str(item["coding_answer_id"]), item)
+            for item in fields_json
+        ]
+        wait(checks)
+
+        # re-raises CircuitOpenError / ExecutorError so the message is not acked
+        graded_answers = [check.result() for check in checks if check.result()]
+        # raises on a failed write, the paper is then neither marked dirty nor acked
+        update_answers_points(graded_answers)
+
+        logger.info(f"DONE CHECKING USER CODE")
+
+        mark_paper_dirty(student_paper_id, message_id)
+
+    except (CircuitOpenError, ExecutorError) as e:
+        logger.warning(f"[Deferred] Message {message_id} left pending: {e}")
+        record_deferral(message_id)
+    except Exception as e:
+        logger.error(f"[Error] Message {message_id} left pending: {e}")
+    finally:
+        with in_flight_lock:
+            in_flight_ids.discard(message_id)
+        papers_in_flight.release()
+
+def record_deferral(message_id):
+    try:
+        redis_client.hincrby(STUDENT_CODE_ANSWER_DEFERRALS_HASH, message_id, 1)
+    except Exception as e:
+        logger.warning(f"Could not record deferral of {message_id}: {e}")
+
+def mark_paper_dirty(student_paper_id, message_id):
+    with dirty_papers_lock:
+        dirty_papers.setdefault(student_paper_id, []).append(message_id)
+
+def recompute_dirty_exam_records():
+    with dirty_papers_lock:
+        papers = dict(dirty_papers)
+        dirty_papers.clear()
+
+    if not papers:
+        return
+
+    logger.info(LOG_SEPARATOR)
+    if update_exam_records(list(papers)) is None:
+        # left pending, the reclaimer grades these papers again
+        return
+
+    for message_ids in papers.values():
+        for message_id in message_ids:
+            pending_acks.put(message_id)
+    logger.info(f"DONE UPDATING {len(papers)} USER EXAM RECORDS")
+
+def recompute_forever():
+    while not shutdown_event.wait(EXAM_RECORD_DEBOUNCE_SECONDS):
+        try:
+            recompute_dirty_exam_records()
+        except Exception as e:
+            logger.error(f"Exception in recompute_forever: {e}", exc_info=True)
 
-def listen_forever():
-    print("Worker started...")
+def dispatch_paper(message_id, fields):
+    with in_flight_lock:
+        if message_id in in_flight_ids:
+            return
+        in_flight_ids.add(message_id)
+
+    # wait for a free slot so unread papers stay in the stream, not in memory
+    papers_in_flight.acquire()
+    paper_pool.submit(check_paper, message_id, fields)
+
+def reclaim_stale_papers():
+    # take over entries other consumers left pending, dead-letter the ones that keep failing
+    start_id = "0-0"
+    while not shutdown_event.is_set() and not executors_unavailable():
+        reply = redis_client.xautoclaim(
+            name=STUDENT_CODE_ANSWER_STREAM,
+            groupname=STUDENT_CODE_ANSWER_GROUP,
+            consumername=STUDENT_CODE_ANSWER_CONSUMER,
+            min_idle_time=WORKER_RECLAIM_IDLE_MS,
+            start_id=start_id,
+            count=worker_batch_size
+        )
+        start_id, messages = reply[0], reply[1]
+        # entries trimmed from the stream while pending come back as None
+        messages = [(message_id, fields) for message_id, fields in messages if fields]
+
+        if messages:
+            logger.info(f"Reclaimed {len(messages)} stale papers")
+            failure_counts = get_failure_counts([message_id for message_id, _ in messages])
+            for message_id, fields in messages:
+                if failure_counts.get(message_id, 0) > WORKER_MAX_DELIVERIES:
+                    dead_letter_paper(message_id, fields, failure_counts[message_id])
+                else:
+                    dispatch_paper(message_id, fields)
+
+        if start_id in (b"0-0", "0-0"):
+            break
+
+    remove_idle_consumers()
+
+def get_failure_counts(message_ids):
+    # deliveries minus the ones deferred while an executor was down
+    delivery_counts = get_delivery_counts(message_ids)
+    deferrals = redis_client.hmget(STUDENT_CODE_ANSWER_DEFERRALS_HASH, message_ids)
+    return {
+        message_id: delivery_counts.get(message_id, 0) - int(deferred or 0)
+        for message_id, deferred in zip(message_ids, deferrals)
+    }
+
+def get_delivery_counts(message_ids):
+    # one XPENDING per claimed id, other entries in the same id range cannot crowd them out
+    with redis_client.pipeline(transaction=False) as pipe:
+        for message_id in message_ids:
+            pipe.xpending_range(
+                name=STUDENT_CODE_ANSWER_STREAM,
+                groupname=STUDENT_CODE_ANSWER_GROUP,
+                min=message_id,
+                max=message_id,
+                count=1
+            )
+        replies = pipe.execute()
+
+    return {entry['message_id']: entry['times_delivered'] for pending in replies for entry in pending}
+
+def remove_idle_consumers():
+    # every restart joins under a new checker-<host>-<pid> name; drop the ones left
+    # behind once they own nothing. A live consumer removed here is recreated by its next read.
+    try:
+        for consumer in redis_client.xinfo_consumers(STUDENT_CODE_ANSWER_STREAM, STUDENT_CODE_ANSWER_GROUP):
+            name = consumer['name'].decode() if isinstance(consumer['name'], bytes) else consumer['name']
+            if name == STUDENT_CODE_ANSWER_CONSUMER or consumer['pending'] > 0 or consumer['idle'] < WORKER_RECLAIM_IDLE_MS:
+                continue
+            redis_client.xgroup_delconsumer(STUDENT_CODE_ANSWER_STREAM, STUDENT_CODE_ANSWER_GROUP, name)
+            logger.info(f"Removed idle consumer {name}")
+    except Exception as e:
+        logger.warning(f"Could not remove idle consumers: {e}")
+
+def dead_letter_paper(message_id, fields, times_failed):
+    logger.error(f"[Dead Letter] Message {message_id} failed {times_failed} deliveries")
+
+    coding_answer_ids = []
+    try:
+        coding_answer_ids = [str(item["coding_answer_id"]) for item in json.loads(fields[b'data'].decode())]
+    except Exception as e:
+        logger.error(f"[Dead Letter] Message {message_id} has unreadable data: {e}")
+
+    with redis_client.pipeline(transaction=True) as pipe:
+        pipe.xadd(
+            STUDENT_CODE_ANSWER_DEAD_LETTER_STREAM,
+            {
+                **fields,
+                'source_id': message_id,
+                'times_failed': times_failed,
+                'consumer': STUDENT_CODE_ANSWER_CONSUMER
+            },
+            maxlen=DEAD_LETTER_MAXLEN,
+            approximate=True
+        )
+        pipe.xack(STUDENT_CODE_ANSWER_STREAM, STUDENT_CODE_ANSWER_GROUP, message_id)
+        pipe.hdel(STUDENT_CODE_ANSWER_DEFERRALS_HASH, message_id)
+        for coding_answer_id in coding_answer_ids:
+            pipe.hset(STUDENT_CODE_ANSWER_UPDATE_HASH, coding_answer_id, CODE_ANSWER_ERROR)
+        pipe.execute()
+
+def ack_checked_papers():
+    message_ids = []
     while True:
         try:
+            message_ids.append(pending_acks.get_nowait())
+        except queue.Empty:
+            break
+
+    if message_ids:
+        # one XACK for the whole batch instead of a round trip per message
+        with redis_client.pipeline(transaction=False) as pipe:
+            pipe.xack(STUDENT_CODE_ANSWER_STREAM, STUDENT_CODE_ANSWER_GROUP, *message_ids)
+            pipe.hdel(STUDENT_CODE_ANSWER_DEFERRALS_HASH, *message_ids)
+            pipe.execute()
+        logger.info(f"Acked {len(message_ids)} checked papers")
+
+def build_worker_pools(max_threads, max_papers):
+    global code_check_pool, paper_pool, papers_in_flight, worker_batch_size
+    code_check_pool = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="code-check")
+    paper_pool = ThreadPoolExecutor(max_workers=max_papers, thread_name_prefix="paper-check")
+    papers_in_flight = threading.BoundedSemaphore(max_papers)
+    worker_batch_size = int(os.getenv("WORKER_BATCH_SIZE", max_papers))
+
+def listen_forever(max_threads=WORKER_MAX_THREADS, max_papers=WORKER_MAX_PAPERS_IN_FLIGHT):
+    build_worker_pools(max_threads, max_papers)
+    print(f"Worker {STUDENT_CODE_ANSWER_CONSUMER} started with {max_threads} threads, {max_papers} papers in flight...")
+    next_reclaim = time.monotonic()
+    threading.Thread(target=recompute_forever, daemon=True, name="exam-record-recompute").start()
+    while not shutdown_event.is_set():
+        try:
+            if time.monotonic() >= next_reclaim:
+                next_reclaim = time.monotonic() + WORKER_RECLAIM_INTERVAL_SECONDS
+                reclaim_stale_papers()
+
+            if executors_unavailable():
+                ack_checked_papers()
+                shutdown_event.wait(WORKER_BLOCK_MS / 1000)
+                continue
+
             user_submitted_codes = redis_client.xreadgroup(
                 groupname=STUDENT_CODE_ANSWER_GROUP,
                 consumername=STUDENT_CODE_ANSWER_CONSUMER,  
                 streams={STUDENT_CODE_ANSWER_STREAM: ">"},   
-                block=0
+                count=worker_batch_size,
+                block=WORKER_BLOCK_MS
             )
 
             if user_submitted_codes:
                 for stream, messages in user_submitted_codes:
                     for message_id, fields in messages:
+                        dispatch_paper(message_id, fields)
 
-                        try:
-                            logger.info(LOG_SEPARATOR)
-                            logger.info(f"CHECKING USER CODE")
-                            raw_json = fields[b'data'].decode()
-                            fields_json = json.loads(raw_json)
-                            student_paper_id = fields_json[0]['student_paper_id']
-                            logger.info(f"Checking paper {student_paper_id}")
-                            
-                            for item in fields_json:
-                                coding_answer_id = str(item["coding_answer_id"])
-                                process_user_code(coding_answer_id, item)
-                            
-                            redis_client.xack(STUDENT_CODE_ANSWER_STREAM, STUDENT_CODE_ANSWER_GROUP, message_id)
-                            logger.info(f"DONE CHECKING USER CODE")
-
-                            logger.info(LOG_SEPARATOR)
-                            update_exam_record(student_paper_id)
-                            logger.info(f"DONE UPDATING USER EXAM RECORD")
-
-                        except Exception as e:
-                           logger.error(f"[Error] Message {message_id}: {e}")
+            ack_checked_papers()
 
         except Exception as e:
             logger.error(f"Exception in listen_forever: {e}", exc_info=True)
             time.sleep(1)   
 
-def start_redis_worker():
+    # let papers already handed to the pool finish before the last ack
+    paper_pool.shutdown(wait=True)
+    code_check_pool.shutdown(wait=True)
+    recompute_dirty_exam_records()
+    ack_checked_papers()
+    logger.info(f"Executor latency: {executor_client.stats()}")
+    logger.info(f"Executor result cache: {get_result_cache_stats()}")
+    executor_client.close()
+    # the database pool belongs to whoever started the worker, see run_worker_process / main.py
+    print("Worker stopped...")
+
+def ensure_consumer_group():
     try:
         redis_client.xgroup_create(name=STUDENT_CODE_ANSWER_STREAM, groupname=STUDENT_CODE_ANSWER_GROUP, id='0', mkstream=True)
     except redis.exceptions.ResponseError as e:
@@ -109,6 +420,66 @@ def start_redis_worker():
             pass
         else:
             raise
-    thread = threading.Thread(target=listen_forever, daemon=True)
-    thread.start()
 
+worker_thread = None
+
+def start_redis_worker():
+    # embedded mode: grade inside the API process on a daemon thread
+    global worker_thread
+    ensure_consumer_group()
+    worker_thread = threading.Thread(target=listen_forever, daemon=True, name="code-checker")
+    worker_thread.start()
+
+def stop_redis_worker(timeout=None):
+    # stops reading; with a timeout, also waits for the embedded worker to drain
+    shutdown_event.set()
+    if timeout is not None and worker_thread is not None:
+        worker_thread.join(timeout)
+        if worker_thread.is_alive():
+            logger.warning(f"Worker still draining after {timeout}s")
+
+def run_worker_process(index, max_threads=WORKER_MAX_THREADS, max_papers=WORKER_MAX_PAPERS_IN_FLIGHT):
+    global STUDENT_CODE_ANSWER_CONSUMER
+    if os.getenv("WORKER_CONSUMER_NAME"):
+        STUDENT_CODE_ANSWER_CONSUMER = f"{os.getenv('WORKER_CONSUMER_NAME')}-{index}"
+
+    # SIGTERM stops reading and drains the papers already being graded
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_redis_worker())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_redis_worker())
+    try:
+        listen_forever(max_threads, max_papers)
+    finally:
+        close_db_pool()
+
+def main():
+    parser = argparse.ArgumentParser(description="Standalone code checker worker")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("WORKER_PROCESSES", 1)))
+    parser.add_argument("--threads", type=int, default=WORKER_MAX_THREADS, help="executor calls in flight per process")
+    parser.add_argument("--papers", type=int, default=WORKER_MAX_PAPERS_IN_FLIGHT, help="papers in flight per process")
+    args = parser.parse_args()
+
+    ensure_consumer_group()
+
+    if args.processes <= 1:
+        run_worker_process(0, args.threads, args.papers)
+        return
+
+    # spawn, not fork: every process needs its own pools, sockets and consumer name
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker_process, args=(index, args.threads, args.papers), name=f"checker-{index}") for index in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    def forward_signal(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, forward_signal)
+    signal.signal(signal.SIGINT, forward_signal)
+
+    for process in processes:
+        process.join()
+
+if __name__ == "__main__":
+    main()
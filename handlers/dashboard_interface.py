@@ -1,6 +1,7 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from typing import List
+from starlette.concurrency import run_in_threadpool
 
 class Context():
     def __init__(self, strategy: Strategy, id_context=None) -> None:
@@ -23,6 +24,11 @@ class Context():
         print(result)
         return result
 
+    async def do_business_logic_async(self):
+        # cache hits are served on the event loop, only a rebuild uses a thread
+        # Redis-backed strategies return the pre-encoded response body
+        return await self._strategy.do_algorithm_async()
+
 class Strategy(ABC):
     """
     The Strategy interface declares operations common to all supported versions
@@ -36,6 +42,9 @@ class Strategy(ABC):
     def do_algorithm(self):
         pass
 
+    async def do_algorithm_async(self):
+        return await run_in_threadpool(self.do_algorithm)
+
     @abstractmethod
     def refresh(self):
         pass
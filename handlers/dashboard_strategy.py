@@ -1,11 +1,16 @@
 import os
 import json
+import time
+import uuid
+import asyncio
+import threading
 from handlers.dashboard_interface import Context, Strategy
-from utils.redis_client import redis_client
-from queries.dashboard_queries import get_exam_data, get_course_data, refresh_exam_data, refresh_course_data, get_all_course_id
+from utils.redis_client import redis_client, async_redis_client
+from starlette.concurrency import run_in_threadpool
+from queries.dashboard_queries import get_exam_data, get_course_data, get_all_course_data, refresh_exam_data
 from utils.logger import logger
-
-DATABASE_URL = f"postgresql://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_DATABASE')}"
+from utils.local_cache import LocalTTLCache, publish_invalidation
+from utils.encoded_body import EncodedBody
 
 CACHE_KEYS = {
     'system' : 'dashboard:system',
@@ -13,6 +18,30 @@ CACHE_KEYS = {
     'course' : 'dashboard:course'
     }
 
+# In-process copies of the Redis entries, dropped on every replica through pub/sub
+DASHBOARD_INVALIDATION_CHANNEL = 'dashboard:invalidate'
+DASHBOARD_LOCAL_CACHE_SIZE = int(os.getenv("DASHBOARD_LOCAL_CACHE_SIZE", 256))
+DASHBOARD_LOCAL_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_LOCAL_CACHE_TTL_SECONDS", 30))
+dashboard_local_cache = LocalTTLCache(DASHBOARD_LOCAL_CACHE_SIZE, DASHBOARD_LOCAL_CACHE_TTL_SECONDS)
+
+# Entries past their soft expiry are still served while one rebuild runs in the background
+DASHBOARD_SOFT_TTL_SECONDS = int(os.getenv("DASHBOARD_SOFT_TTL_SECONDS", 1800))
+# Single-flight rebuild lock per key, and how long readers of a cold key wait for it
+DASHBOARD_REBUILD_LOCK_SECONDS = int(os.getenv("DASHBOARD_REBUILD_LOCK_SECONDS", 120))
+DASHBOARD_REBUILD_WAIT_SECONDS = float(os.getenv("DASHBOARD_REBUILD_WAIT_SECONDS", 15))
+DASHBOARD_REBUILD_POLL_SECONDS = 0.1
+
+# Deletes the rebuild lock only while it still holds our token, so a holder whose
+# lock expired mid-build cannot release the lock of the next holder
+RELEASE_REBUILD_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+release_rebuild_lock_script = redis_client.register_script(RELEASE_REBUILD_LOCK_SCRIPT)
+release_rebuild_lock_script_async = async_redis_client.register_script(RELEASE_REBUILD_LOCK_SCRIPT)
+
 class GetSystemDashboardCache(Strategy):
     def __init__(self):
         self.id_context = None
@@ -28,85 +57,235 @@ class GetSystemDashboardCache(Strategy):
         data = {}
         return data
 
-class GetExamDashboardCache(Strategy):
+class CachedDashboardStrategy(Strategy):
+    """
+    Shared read path of the Redis-backed dashboard strategies:
+    in-process copy -> Redis entry -> single-flight rebuild from Postgres.
+
+    Entries are kept as pre-encoded, possibly gzipped, response bytes
+    (EncodedBody) both locally and in Redis, and carry a soft expiry. A stale
+    entry is still returned while one background rebuild, guarded by a Redis
+    lock, replaces it. On a cold key only the lock holder queries Postgres;
+    other readers wait for its result and get None if it does not produce one.
+
+    Subclasses say where the entry lives (read_entry / write_entry) and how to
+    fetch it (fetch_data).
+    """
+
     def __init__(self):
         self.id_context = None
 
+    def local_key(self) -> str:
+        raise NotImplementedError
+
+    def read_entry(self):
+        raise NotImplementedError
+
+    async def read_entry_async(self):
+        raise NotImplementedError
+
+    def write_entry(self, value) -> None:
+        raise NotImplementedError
+
+    def fetch_data(self):
+        raise NotImplementedError
+
     def do_algorithm(self) -> dict:
-        redis_key = CACHE_KEYS['exam']
-        if self.validate(redis_key):
-            return self.get_cached_data(redis_key)
-        else: 
-            return self.build_key(redis_key)
-    
-    def refresh(self) -> dict:
-        redis_key = CACHE_KEYS['exam']
-        refresh_exam_data()
-        self.build_key(redis_key)
-    
+        entry = self.get_entry()
+        return entry.decode() if entry else None
+
+    async def do_algorithm_async(self) -> EncodedBody:
+        # routes send the cached bytes as they are, no decode/encode per hit
+        entry = dashboard_local_cache.get(self.local_key())
+        if entry is not None:
+            return entry
+
+        entry = EncodedBody.from_redis(await self.read_entry_async())
+        if entry is None:
+            return await self.build_entry_once_async()
+        return await self.serve_entry_async(entry)
+
+    def get_entry(self) -> EncodedBody:
+        entry = dashboard_local_cache.get(self.local_key())
+        if entry is not None:
+            return entry
+
+        entry = EncodedBody.from_redis(self.read_entry())
+        if entry is None:
+            return self.build_entry_once()
+        return self.serve_entry(entry)
+
+    def serve_entry(self, entry: EncodedBody) -> EncodedBody:
+        if entry.soft_expires_at <= time.time():
+            # the rebuild publishes an invalidation, replacing this local copy
+            self.revalidate_in_background()
+        dashboard_local_cache.set(self.local_key(), entry)
+        return entry
+
+    async def serve_entry_async(self, entry: EncodedBody) -> EncodedBody:
+        # same as serve_entry, but the lock is taken without blocking the event loop
+        if entry.soft_expires_at <= time.time():
+            token = await acquire_rebuild_lock_async(self.local_key())
+            if token:
+                self.start_background_rebuild(token)
+        dashboard_local_cache.set(self.local_key(), entry)
+        return entry
+
     def validate(self, redis_key) -> bool:
-        return redis_client.exists(redis_key) > 0
+        entry = EncodedBody.from_redis(self.read_entry())
+        return entry is not None and entry.soft_expires_at > time.time()
 
-    def build_key(self, redis_key):
+    def get_cached_data(self, redis_key):
+        entry = EncodedBody.from_redis(self.read_entry())
+        return entry.decode() if entry else None
+
+    def build_key(self, redis_key=None):
+        entry = self.build_entry()
+        return entry.decode() if entry else None
+
+    def build_entry(self) -> EncodedBody:
         # fetch data to database
-        exam_data = get_exam_data()
+        data = self.fetch_data()
+        if data is None:
+            return None
 
-        # cache to redis and redis_key
-        redis_ready_data = json.dumps(exam_data)
-        redis_client.set(redis_key, redis_ready_data)
+        # encode once and cache to redis with a fresh soft expiry
+        entry = EncodedBody.encode(data, time.time() + DASHBOARD_SOFT_TTL_SECONDS)
+        self.write_entry(entry.to_redis())
+        dashboard_local_cache.set(self.local_key(), entry)
+        publish_invalidation(DASHBOARD_INVALIDATION_CHANNEL, self.local_key())
 
-        return exam_data
-    
-    def get_cached_data(self, redis_key):
-        cached_data = json.loads(redis_client.get(redis_key))
+        return entry
 
-        print(cached_data)
-        return cached_data
-        
-class GetCourseDashboardCache(Strategy):
-    def __init__(self):
-        self.id_context = None  
+    def build_entry_once(self) -> EncodedBody:
+        token = acquire_rebuild_lock(self.local_key())
+        if token:
+            try:
+                return self.build_entry()
+            finally:
+                release_rebuild_lock(self.local_key(), token)
 
-    def do_algorithm(self) -> dict:
-        redis_key = CACHE_KEYS['course']
-        if self.validate(redis_key):
-            return self.get_cached_data(redis_key)
-        else: 
-            return self.build_key(redis_key)
+        # someone else is building this key, wait for their result; waiters never
+        # build themselves, a slow or empty build must not fan out to every reader
+        deadline = time.monotonic() + DASHBOARD_REBUILD_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(DASHBOARD_REBUILD_POLL_SECONDS)
+            entry = EncodedBody.from_redis(self.read_entry())
+            if entry is not None:
+                return entry
+            if not redis_client.exists(f"{self.local_key()}:rebuild_lock"):
+                # the holder finished without writing an entry
+                return None
+
+        logger.warning(f"Gave up waiting for rebuild of {self.local_key()}")
+        return None
+
+    async def build_entry_once_async(self) -> EncodedBody:
+        token = await acquire_rebuild_lock_async(self.local_key())
+        if token:
+            try:
+                return await run_in_threadpool(self.build_entry)
+            finally:
+                await release_rebuild_lock_async(self.local_key(), token)
+
+        deadline = time.monotonic() + DASHBOARD_REBUILD_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(DASHBOARD_REBUILD_POLL_SECONDS)
+            entry = EncodedBody.from_redis(await self.read_entry_async())
+            if entry is not None:
+                return entry
+            if not await async_redis_client.exists(f"{self.local_key()}:rebuild_lock"):
+                return None
+
+        logger.warning(f"Gave up waiting for rebuild of {self.local_key()}")
+        return None
+
+    def revalidate_in_background(self) -> None:
+        token = acquire_rebuild_lock(self.local_key())
+        if token:
+            self.start_background_rebuild(token)
+
+    def start_background_rebuild(self, token: str) -> None:
+        # the caller holds the rebuild lock under token, the thread releases it
+        def rebuild():
+            try:
+                self.build_entry()
+            except Exception as e:
+                logger.exception(f"❌ Background rebuild of {self.local_key()} failed because {e}")
+            finally:
+                release_rebuild_lock(self.local_key(), token)
+
+        threading.Thread(target=rebuild, daemon=True).start()
+
+class GetExamDashboardCache(CachedDashboardStrategy):
+    def local_key(self) -> str:
+        return CACHE_KEYS['exam']
+
+    def read_entry(self):
+        return redis_client.get(CACHE_KEYS['exam'])
+
+    async def read_entry_async(self):
+        return await async_redis_client.get(CACHE_KEYS['exam'])
+
+    def write_entry(self, value) -> None:
+        redis_client.set(CACHE_KEYS['exam'], value)
+
+    def fetch_data(self):
+        return get_exam_data()
+
+    def refresh(self, refresh_views=True) -> dict:
+        if refresh_views:
+            refresh_exam_data()
+        self.build_entry()
         
+class GetCourseDashboardCache(CachedDashboardStrategy):
+    def local_key(self) -> str:
+        return f"{CACHE_KEYS['course']}:{self.id_context}"
+
+    def read_entry(self):
+        return redis_client.hget(CACHE_KEYS['course'], f"course:{self.id_context}")
+
+    async def read_entry_async(self):
+        return await async_redis_client.hget(CACHE_KEYS['course'], f"course:{self.id_context}")
+
+    def write_entry(self, value) -> None:
+        redis_client.hset(CACHE_KEYS['course'], f"course:{self.id_context}", value)
+
+    def fetch_data(self):
+        return get_course_data(self.id_context)
+
     def refresh(self):
-        refresh_course_data()
-        
-        course_ids = get_all_course_id()
-        updated_data = {}
+        # every course from one pass over the summary tables, written with a single HSET
+        all_course_data = get_all_course_data()
+        if not all_course_data:
+            return
 
-        for course_id in course_ids:
-            self.id_context = course_id
-            course_data = self.build_key(CACHE_KEYS['course'])
-            updated_data[course_id] = course_data
+        soft_expires_at = time.time() + DASHBOARD_SOFT_TTL_SECONDS
+        redis_client.hset(CACHE_KEYS['course'], mapping={
+            f"course:{course_id}": EncodedBody.encode(course_data, soft_expires_at).to_redis()
+            for course_id, course_data in all_course_data.items()
+        })
+        dashboard_local_cache.invalidate(f"{CACHE_KEYS['course']}:*")
+        publish_invalidation(DASHBOARD_INVALIDATION_CHANNEL, f"{CACHE_KEYS['course']}:*")
 
-    
-    def validate(self, redis_key) -> bool:
-        field = f"course:{self.id_context}"
-        return redis_client.hexists(redis_key, field)
+def acquire_rebuild_lock(key: str):
+    # the token identifies this holder, None when someone else holds the lock
+    token = uuid.uuid4().hex
+    if redis_client.set(f"{key}:rebuild_lock", token, nx=True, ex=DASHBOARD_REBUILD_LOCK_SECONDS):
+        return token
+    return None
 
-    def build_key(self, redis_key):
-        # fetch data to database
-        course_data = get_course_data(self.id_context)
+def release_rebuild_lock(key: str, token: str) -> None:
+    release_rebuild_lock_script(keys=[f"{key}:rebuild_lock"], args=[token])
 
-        # cache to redis and redis_key
-        redis_ready_data = json.dumps(course_data)
-        redis_client.hset(redis_key, f"course:{self.id_context}", redis_ready_data)
+async def acquire_rebuild_lock_async(key: str):
+    token = uuid.uuid4().hex
+    if await async_redis_client.set(f"{key}:rebuild_lock", token, nx=True, ex=DASHBOARD_REBUILD_LOCK_SECONDS):
+        return token
+    return None
 
-        return course_data
-    
-    def get_cached_data(self, redis_key):
-        field = f"course:{self.id_context}"
-        value = redis_client.hget(redis_key, field)
-        print(value)
-        if value:
-            return json.loads(value)
-        return None
+async def release_rebuild_lock_async(key: str, token: str) -> None:
+    await release_rebuild_lock_script_async(keys=[f"{key}:rebuild_lock"], args=[token])
 
 def prepare_for_redis_hash(data: dict) -> dict:
     redis_data = {}
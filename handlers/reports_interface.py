@@ -1,13 +1,52 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Any, Dict, List, Tuple
 import polars as pl
+from queries.reports_queries import STUDENT_PERFORMANCE_COLUMNS, STUDENT_STATUS_SCHEMA, get_report_frames
+
+class ReportPlans():
+    """
+    Lazy subplans several strategies build on. Every strategy gets the same
+    LazyFrame objects, so collect_all computes each of them once.
+    """
+    columns: Tuple[str, ...] = ('user_id', 'attempt', 'exam_id', 'course_abbreviation', 'points_obtained', 'question_points')
+
+    def __init__(self, lf: pl.LazyFrame, student_statuses: pl.DataFrame = None) -> None:
+        self.latest_attempts = self._get_latest_attempts(lf)
+        self.student_scores = self._get_student_scores(self.latest_attempts)
+        # latest exam record status per student, loaded next to the performances
+        if student_statuses is None:
+            student_statuses = pl.DataFrame(schema=STUDENT_STATUS_SCHEMA)
+        self.student_statuses = student_statuses.lazy()
+
+    @staticmethod
+    def _get_latest_attempts(lf: pl.LazyFrame) -> pl.LazyFrame:
+        return (
+            lf
+            .filter(pl.col("attempt") == pl.col("attempt").max().over("user_id"))
+        )
+
+    @staticmethod
+    def _get_student_scores(latest_attempts: pl.LazyFrame) -> pl.LazyFrame:
+        # one row per student: their latest attempt's score and the exam's maximum
+        return (
+            latest_attempts
+            .group_by("user_id")
+            .agg(
+                pl.col("exam_id").first(),
+                pl.col("course_abbreviation").first(),
+                pl.col("points_obtained").sum().alias("total_score"),
+                pl.col("question_points").sum().alias("max_score")
+            )
+        )
 
 class Context():
-    def __init__(self, df: pl.DataFrame,  strategies: List[Strategy]) -> None:
-        self.df = df
+    def __init__(self, exam_id: int,  strategies: List[Strategy]) -> None:
+        self.exam_id = exam_id
+        self.df = None
+        self.student_statuses = None
         self.exam_data = {}
-        self._strategies = strategies 
+        self._strategies = strategies
 
     @property
     def strategy(self) -> Strategy:
@@ -17,42 +56,51 @@ class Context():
     def strategy(self, strategy: Strategy) -> None:
         self._strategy = strategy
 
-    def do_business_logic(self) -> None:
-        processed_df = self._get_latest_attempts_df()
-        
+    def required_columns(self) -> List[str]:
+        # union of what the shared plans and the strategies read, in view order
+        needed = set(ReportPlans.columns)
         for strategy in self._strategies:
-            # Each strategy runs its calculation on the *processed* DataFrame
-            report_chunk = strategy.calculate(processed_df)
+            needed.update(strategy.columns)
+        return [column for column in STUDENT_PERFORMANCE_COLUMNS if column in needed]
+
+    def do_business_logic(self) -> None:
+        if self.df is None:
+            self.df, self.student_statuses = get_report_frames(self.exam_id, self.required_columns())
+        plans = ReportPlans(self.df.lazy(), self.student_statuses)
+
+        # every strategy's plans plus the raw frame run as one query
+        strategy_plans = [strategy.plan(plans) for strategy in self._strategies]
+        lazy_frames = [lf for named_plans in strategy_plans for lf in named_plans.values()]
+        collected = iter(pl.collect_all([*lazy_frames, plans.latest_attempts]))
+
+        for strategy, named_plans in zip(self._strategies, strategy_plans):
+            frames = {name: next(collected) for name in named_plans}
+            report_chunk = strategy.finalize(frames)
             self.exam_data.update(report_chunk)
-        
+        processed_df = next(collected)
+
         exam_performance = {
             'exam_performance' : self.exam_data,
             'raw_exam_performance' : processed_df.to_dicts()
         }
         return exam_performance
 
-    def _get_latest_attempts_df(self) -> pl.DataFrame:
-        get_max_attempts = (
-            self.df
-            .group_by("user_id")
-            .agg(
-                pl.col("attempt").max().alias("latest_attempt")
-            )
-        )
-
-        df_with_max = self.df.join(get_max_attempts, on="user_id", how="left")
-
-        latest_attempts_df = (
-            df_with_max
-            .filter(pl.col("attempt") == pl.col("latest_attempt"))
-            .drop("latest_attempt")
-        )
-        
-        return latest_attempts_df
-    
 class Strategy(ABC):
+    # student_performances columns this strategy reads, see STUDENT_PERFORMANCE_COLUMNS
+    columns: Tuple[str, ...] = ()
+
     @abstractmethod
-    def calculate(self, df:pl.DataFrame):
+    def plan(self, plans: ReportPlans) -> Dict[str, pl.LazyFrame]:
+        # named lazy frames, collected together by the Context
         pass
 
+    @abstractmethod
+    def finalize(self, frames: Dict[str, pl.DataFrame]) -> Dict[str, Any]:
+        # shape the collected frames into this strategy's report chunk
+        pass
 
+    def calculate(self, df: pl.DataFrame) -> Dict[str, Any]:
+        # run this strategy alone
+        named_plans = self.plan(ReportPlans(df.lazy()))
+        frames = dict(zip(named_plans, pl.collect_all(list(named_plans.values()))))
+        return self.finalize(frames)
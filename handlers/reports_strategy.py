@@ -1,55 +1,16 @@
 from __future__ import annotations
 from typing import Dict, Any, List
 import polars as pl
-from handlers.reports_interface import Context, Strategy
-from utils.database_config import DATABASE_URL
+from handlers.reports_interface import Context, Strategy, ReportPlans
 
 class CalculateExamDescriptiveStatistics(Strategy):
-    def calculate(self, df: pl.DataFrame) -> Dict[str, Any]:
-        student_ids_list = df.select('user_id').unique().to_series().to_list()
-
-        get_student_statuses_query = f"""
-            WITH RankedAttempts AS (
-                SELECT
-                    er.attempt, 
-                    er.status,
-                    sp.user_id,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY sp.user_id
-                        ORDER BY er.created_at DESC
-                    ) as rn
-                FROM
-                    exam_records er
-                JOIN
-                    student_papers sp ON sp.id = er.student_paper_id
-                WHERE
-                    sp.user_id = ANY (ARRAY{student_ids_list}) 
-            )
-            SELECT
-                user_id, attempt, status
-            FROM
-                RankedAttempts
-            WHERE
-                rn = 1
-        """
-        student_statuses_df = pl.read_database_uri(query=get_student_statuses_query, uri=DATABASE_URL)
-        student_statuses_count = student_statuses_df.group_by('status').agg(pl.count().alias("count"))
-        student_statuses_count_formatted = dict(zip(
-            student_statuses_count.get_column("status").to_list(),
-            student_statuses_count.get_column("count").to_list()
-        ))
+    columns = ('user_id', 'subject_id', 'subject_name', 'question_id', 'question_level', 'question_points', 'points_obtained')
+
+    def plan(self, plans: ReportPlans) -> Dict[str, pl.LazyFrame]:
+        df = plans.latest_attempts
 
-        student_scores = (
-            df
-            .group_by('user_id')
-            .agg(
-                pl.col('points_obtained').sum().alias('total_score'),
-                pl.col('question_points').sum().alias('max_score')
-            )
-        )
-        
         exam_summary_data = (
-            student_scores
+            plans.student_scores
             .select(
                 pl.col('total_score').mean().alias('mean'),
                 pl.col('total_score').median().alias('median'),
@@ -63,8 +24,7 @@ class CalculateExamDescriptiveStatistics(Strategy):
                 (pl.col('max') - pl.col('min')).alias('range')
             )
         )
-        exam_summary_data = exam_summary_data.row(0, named=True)
-        
+
         raw_question_levels_summary_data = (
             df
             .group_by('question_level')
@@ -79,11 +39,6 @@ class CalculateExamDescriptiveStatistics(Strategy):
             )
             .sort('accuracy_percentage', descending=True) 
         )
-        list_of_level_dicts: List[Dict] = raw_question_levels_summary_data.to_dicts()
-        question_levels_summary_data = {
-            d['question_level']: {k: v for k, v in d.items() if k != 'question_level'}
-            for d in list_of_level_dicts
-        }
 
         raw_subjects_min_max_data = (
             df
@@ -101,6 +56,32 @@ class CalculateExamDescriptiveStatistics(Strategy):
             .sort('accuracy_percentage', descending=True)
         )
 
+        student_statuses_count = plans.student_statuses.group_by('status').agg(pl.len().alias("count"))
+
+        return {
+            'student_statuses_count': student_statuses_count,
+            'exam_summary_data': exam_summary_data,
+            'raw_question_levels_summary_data': raw_question_levels_summary_data,
+            'raw_subjects_min_max_data': raw_subjects_min_max_data,
+        }
+
+    def finalize(self, frames: Dict[str, pl.DataFrame]) -> Dict[str, Any]:
+        student_statuses_count = frames['student_statuses_count']
+        student_statuses_count_formatted = dict(zip(
+            student_statuses_count.get_column("status").to_list(),
+            student_statuses_count.get_column("count").to_list()
+        ))
+
+        exam_summary_data = frames['exam_summary_data'].row(0, named=True)
+
+        list_of_level_dicts: List[Dict] = frames['raw_question_levels_summary_data'].to_dicts()
+        question_levels_summary_data = {
+            d['question_level']: {k: v for k, v in d.items() if k != 'question_level'}
+            for d in list_of_level_dicts
+        }
+
+        raw_subjects_min_max_data = frames['raw_subjects_min_max_data']
+
         top_three_max_subjects = (
             raw_subjects_min_max_data
             .sort('accuracy', descending=True)  # Sort descending for MAX
@@ -130,7 +111,25 @@ class CalculateExamDescriptiveStatistics(Strategy):
         return calculated_data
     
 class CalculateExamOverview(Strategy):
-    def calculate(self, df: pl.DataFrame) -> Dict[str, Any]:
+    columns = ('user_id', 'course_id', 'course_abbreviation', 'subject_id', 'topic_id', 'question_id', 'question_level')
+
+    def plan(self, plans: ReportPlans) -> Dict[str, pl.LazyFrame]:
+        exam_overview = (
+            plans.latest_attempts
+            .select(
+                pl.col('user_id').n_unique().alias('student_count'),
+                pl.col('subject_id').unique().implode().alias('subjects'),
+                pl.col('subject_id').n_unique().alias('subject_count'),
+                pl.col('course_abbreviation').unique().implode().alias('courses'),
+                pl.col('course_id').n_unique().alias('course_count'),
+                pl.col('topic_id').n_unique().alias('topic_count'),
+                pl.col('question_id').n_unique().alias('question_count'),
+                pl.col('question_level').unique().implode().alias('question_levels'),
+            )
+        )
+        return {'exam_overview': exam_overview}
+
+    def finalize(self, frames: Dict[str, pl.DataFrame]) -> Dict[str, Any]:
         LEVEL_ORDER = [
             'remember',
             'understand',
@@ -139,14 +138,15 @@ class CalculateExamOverview(Strategy):
             'evaluate',
             'create'
         ]
-        student_count = df['user_id'].n_unique()
-        subjects = df['subject_id'].unique().to_list()
-        subject_count = df['subject_id'].n_unique()
-        courses = df['course_abbreviation'].unique().to_list()
-        course_count = df['course_id'].n_unique()
-        topic_count = df['topic_id'].n_unique()
-        questions_count = df['question_id'].n_unique()
-        question_levels = df['question_level'].unique().to_list()
+        exam_overview = frames['exam_overview'].row(0, named=True)
+        student_count = exam_overview['student_count']
+        subjects = exam_overview['subjects']
+        subject_count = exam_overview['subject_count']
+        courses = exam_overview['courses']
+        course_count = exam_overview['course_count']
+        topic_count = exam_overview['topic_count']
+        questions_count = exam_overview['question_count']
+        question_levels = exam_overview['question_levels']
         
         calculated_data = {
             'exam_overview_data' : {
@@ -163,16 +163,17 @@ class CalculateExamOverview(Strategy):
         return calculated_data
 
 class CalculateExamHistogramBoxplot(Strategy):
-    def calculate(self, df: pl.DataFrame) -> Dict[str, Any]:
+    columns = ('user_id', 'course_abbreviation', 'question_points', 'points_obtained')
+
+    def plan(self, plans: ReportPlans) -> Dict[str, pl.LazyFrame]:
         exam_scores_histogram_box_plot = (
-            df
-            .group_by('user_id')
-            .agg(
-                pl.col('course_abbreviation').unique().first(),
-                pl.col('points_obtained').sum().alias('total_score'),
-                pl.col('question_points').sum().alias('max_score')
-            )
-        ).to_dicts()
+            plans.student_scores
+            .select('user_id', 'course_abbreviation', 'total_score', 'max_score')
+        )
+        return {'exam_scores_histogram_box_plot': exam_scores_histogram_box_plot}
+
+    def finalize(self, frames: Dict[str, pl.DataFrame]) -> Dict[str, Any]:
+        exam_scores_histogram_box_plot = frames['exam_scores_histogram_box_plot'].to_dicts()
         
         calculated_data = {
             'exam_histogram_boxplot_data' : exam_scores_histogram_box_plot
@@ -180,12 +181,17 @@ class CalculateExamHistogramBoxplot(Strategy):
         return calculated_data
     
 class CalculateExamBySubjectsAndTopics(Strategy):
-    def calculate(self, df: pl.DataFrame) -> Dict[str, Any]:
-        df_subjects = self.calculate_normalized_scores(df, 'subject_name')
-        exam_groupby_subjects = self.restructure_report(df_subjects, 'subject_name')
+    columns = ('course_abbreviation', 'subject_name', 'topic_name', 'question_points', 'points_obtained')
 
-        df_topics = self.calculate_normalized_scores(df, 'topic_name')
-        exam_groupby_topics = self.restructure_report(df_topics, 'topic_name')
+    def plan(self, plans: ReportPlans) -> Dict[str, pl.LazyFrame]:
+        return {
+            'subject_name': self.calculate_normalized_scores(plans.latest_attempts, 'subject_name'),
+            'topic_name': self.calculate_normalized_scores(plans.latest_attempts, 'topic_name'),
+        }
+
+    def finalize(self, frames: Dict[str, pl.DataFrame]) -> Dict[str, Any]:
+        exam_groupby_subjects = self.restructure_report(frames['subject_name'], 'subject_name')
+        exam_groupby_topics = self.restructure_report(frames['topic_name'], 'topic_name')
 
         calculated_data = {
             'normalized_exam_scores_by_subjects': exam_groupby_subjects,
@@ -194,7 +200,7 @@ class CalculateExamBySubjectsAndTopics(Strategy):
         return calculated_data
     
     @staticmethod
-    def calculate_normalized_scores(df: pl.DataFrame, group_col: str) -> pl.DataFrame:
+    def calculate_normalized_scores(df: pl.LazyFrame, group_col: str) -> pl.LazyFrame:
         # Calculates the weighted normalized score grouped by course and a specified column.
         return (
             df
@@ -231,9 +237,11 @@ class CalculateExamBySubjectsAndTopics(Strategy):
         return final_report_data
     
 class CalculateExamBYTypeWithLevels(Strategy):
-    def calculate(self, df: pl.DataFrame) -> Dict[str, Any]:
+    columns = ('course_abbreviation', 'question_type', 'question_level', 'question_points', 'points_obtained')
+
+    def plan(self, plans: ReportPlans) -> Dict[str, pl.LazyFrame]:
         df_long = (
-            df
+            plans.latest_attempts
             .group_by('course_abbreviation', 'question_type', 'question_level')
             .agg(
                 pl.col('points_obtained').sum().alias('raw_score_sum'),
@@ -274,9 +282,11 @@ class CalculateExamBYTypeWithLevels(Strategy):
             )
             .sort(['question_type', 'course_abbreviation',  'question_level'])
         )
+        return {'df_combined': df_combined}
 
+    def finalize(self, frames: Dict[str, pl.DataFrame]) -> Dict[str, Any]:
         # --- D. Restructure ---
-        restructured = self.restructure_for_plotly(df_combined)
+        restructured = self.restructure_for_plotly(frames['df_combined'])
         
         calculated_data = {
             'exam_by_types_with_levels' : restructured
@@ -359,9 +369,11 @@ class CalculateExamBYTypeWithLevels(Strategy):
         return final_data
     
 class CalculateExamQuestionHeatStrip(Strategy):
-    def calculate(self, df: pl.DataFrame) -> Dict[str, Any]:
+    columns = ('subject_name', 'topic_name', 'question_id', 'question_name', 'question_type', 'question_level', 'question_points', 'points_obtained', 'first_viewed_at', 'first_answered_at', 'last_answered_at')
+
+    def plan(self, plans: ReportPlans) -> Dict[str, pl.LazyFrame]:
         exam_questions_score = (
-            df
+            plans.latest_attempts
             .group_by('question_id')
             .agg(
                 pl.col('question_name').unique().first(),
@@ -387,7 +399,11 @@ class CalculateExamQuestionHeatStrip(Strategy):
                     .round(1)
                     .alias('accuracy_percentage'),
             )
-        ).to_dicts()
+        )
+        return {'exam_questions_score': exam_questions_score}
+
+    def finalize(self, frames: Dict[str, pl.DataFrame]) -> Dict[str, Any]:
+        exam_questions_score = frames['exam_questions_score'].to_dicts()
         
         calculated_data = {
             'exam_question_heatstrip' : exam_questions_score
@@ -395,47 +411,25 @@ class CalculateExamQuestionHeatStrip(Strategy):
         return calculated_data
 
 class CalculateIndividualQuestionAnalysis(Strategy):
-    def calculate(self, df: pl.DataFrame) -> Dict[str, Any]:
-        latest_attempts = (
-            df
-            .group_by("user_id")
-            .agg(pl.col("attempt").max().alias("latest_attempt"))
-        )
-        student_total_scores = (
-            df
-            .join(latest_attempts, on=["user_id"])
-            .filter(pl.col("attempt") == pl.col("latest_attempt"))
-            .group_by("user_id", "exam_id")
-            .agg(
-                pl.col("points_obtained").sum().alias("total_score"),
-                pl.col("question_points").sum().alias("max_possible_score")
-            )
-        )
-
-        quantiles = student_total_scores.select(
-            pl.col("total_score").quantile(0.73).alias("upper_threshold"),
-            pl.col("total_score").quantile(0.27).alias("lower_threshold")
-        )
-
-        upper_threshold = quantiles["upper_threshold"][0]
-        lower_threshold = quantiles["lower_threshold"][0]
+    columns = ('exam_id', 'user_id', 'subject_name', 'topic_name', 'question_id', 'question_name', 'question_type', 'question_level', 'question_points', 'points_obtained', 'is_answered', 'is_correct')
 
+    def plan(self, plans: ReportPlans) -> Dict[str, pl.LazyFrame]:
+        # thresholds are computed over all students inside the plan, no eager round trip
         student_groups = (
-            student_total_scores
+            plans.student_scores
             .with_columns(
-                pl.when(pl.col("total_score") >= upper_threshold)
+                pl.when(pl.col("total_score") >= pl.col("total_score").quantile(0.73))
                     .then(pl.lit("upper"))
-                    .when(pl.col("total_score") <= lower_threshold)
+                    .when(pl.col("total_score") <= pl.col("total_score").quantile(0.27))
                     .then(pl.lit("lower"))
                     .otherwise(pl.lit("middle"))
                     .alias("performance_group")
             )
+            .select("user_id", "exam_id", "performance_group")
         )
 
         question_stats = (
-            df
-            .join(latest_attempts, on="user_id")
-            .filter(pl.col("attempt") == pl.col("latest_attempt"))
+            plans.latest_attempts
             .join(student_groups, on=["user_id", "exam_id"])
             .group_by("question_id")
             .agg(
@@ -483,8 +477,11 @@ class CalculateIndividualQuestionAnalysis(Strategy):
                     ).alias("lower_group_percent_correct"),
                 )
             .sort("discrimination_index", descending=True)
-            .to_dicts()
         )
+        return {'question_stats': question_stats}
+
+    def finalize(self, frames: Dict[str, pl.DataFrame]) -> Dict[str, Any]:
+        question_stats = frames['question_stats'].to_dicts()
 
         calculated_data = {
             'individual_question_stats' : question_stats
@@ -492,11 +489,13 @@ class CalculateIndividualQuestionAnalysis(Strategy):
         return calculated_data
 
 class CalculateIndividualStudentPerformance(Strategy):
-    def calculate(self, df: pl.DataFrame) -> Dict[str, Any]:
+    columns = ('user_id', 'attempt', 'student_name', 'student_email', 'course_abbreviation', 'question_level', 'points_obtained', 'is_correct')
+
+    def plan(self, plans: ReportPlans) -> Dict[str, pl.LazyFrame]:
         levels = ["remember", "understand", "apply", "analyze", "evaluate", "create"]
 
         individual_student_performance = (
-            df
+            plans.latest_attempts
             .group_by("user_id", "attempt")
             .agg(
                 pl.col("student_name").first(),
@@ -517,8 +516,11 @@ class CalculateIndividualStudentPerformance(Strategy):
                 ],
             )
             .sort('total_score', descending=True)
-            .to_dicts()
         )
+        return {'individual_student_performance': individual_student_performance}
+
+    def finalize(self, frames: Dict[str, pl.DataFrame]) -> Dict[str, Any]:
+        individual_student_performance = frames['individual_student_performance'].to_dicts()
 
         calculated_data = {
             'individual_student_performance' : individual_student_performance
@@ -1,33 +1,52 @@
 from typing import Union
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 import json
+import os
 import exam_taking_worker as worker
-from utils.redis_client import redis_client
+from utils.redis_client import redis_client, async_redis_client
+from utils.database_pool import close_db_pool, close_arrow_db_pool, check_db_connection
 from dashboard import router, refresh_dashboard_job
+from queries.dashboard_summary_queries import ensure_dashboard_summary
+from handlers.dashboard_strategy import dashboard_local_cache, DASHBOARD_INVALIDATION_CHANNEL
+from utils.local_cache import start_invalidation_listener
 from reports import router as reports_router
 
 scheduler = BackgroundScheduler()
 process = []
 
+# Set to false when graders run separately with `python -m exam_taking_worker`
+RUN_EMBEDDED_WORKER = os.getenv("RUN_EMBEDDED_WORKER", "true").lower() in ("1", "true", "yes")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    start_invalidation_listener(DASHBOARD_INVALIDATION_CHANNEL, dashboard_local_cache)
+
     # Add initial data on startup
-    worker.start_redis_worker()
+    if RUN_EMBEDDED_WORKER:
+        worker.start_redis_worker()
 
     # Schedule the job every 10 minutes
     scheduler.add_job(refresh_dashboard_job, CronTrigger(minute='*/10'))
     scheduler.start()
 
     # Immediately run once on startup
-    refresh_dashboard_job()
+    ensure_dashboard_summary()
+    refresh_dashboard_job(full=True)
     yield
 
     # Close Redis connection on shutdown
+    # the embedded worker drains into the shared pool, so it is joined before the pool closes
+    if RUN_EMBEDDED_WORKER:
+        await run_in_threadpool(worker.stop_redis_worker, worker.WORKER_DRAIN_TIMEOUT_SECONDS)
     scheduler.shutdown()
-    await redis_client.close()
+    close_db_pool()
+    close_arrow_db_pool()
+    redis_client.close()
+    await async_redis_client.aclose()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -39,6 +58,14 @@ async def read_root():
     return 'yes'
 
 
+@app.get("/health")
+async def health_check():
+    # used by the container HEALTHCHECK; the DB check borrows the shared sync pool
+    await run_in_threadpool(check_db_connection)
+    await async_redis_client.ping()
+    return 'ok'
+
+
 @app.get("/dockerhub")
 async def test_CI():
     # strategy pattern
@@ -1,18 +1,20 @@
-import os
-import psycopg
 import json
+import time
 from collections import defaultdict
 from utils.logger import logger
+from utils.redis_client import redis_client
+from utils.database_pool import get_db_connection
 
-DATABASE_URL = f"postgresql://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_DATABASE')}"
+MV_REFRESH_DURATIONS_KEY = 'dashboard:mv_refresh_seconds'
 
 # system queries
 
 # exam queries
 
 def refresh_exam_data():
+    started = time.perf_counter()
     try:
-        with psycopg.connect(DATABASE_URL) as conn:
+        with get_db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                 DO $$
@@ -35,28 +37,30 @@ def refresh_exam_data():
                                 JOIN course_exam ce ON ce.exam_id = e.id 
                                 JOIN courses c ON c.id = ce.course_id
                                 GROUP BY e.id, c.id, c.name, c.abbreviation, e.is_published, e.examination_date;
+
+                        CREATE UNIQUE INDEX idx_exam_stats_mv_exam_course ON exam_stats_mv (exam_id, course_id);
                     ELSE
-                        REFRESH MATERIALIZED VIEW exam_stats_mv;
+                        -- REFRESH ... CONCURRENTLY needs a unique index, older deployments lack it
+                        CREATE UNIQUE INDEX IF NOT EXISTS idx_exam_stats_mv_exam_course ON exam_stats_mv (exam_id, course_id);
+                        REFRESH MATERIALIZED VIEW CONCURRENTLY exam_stats_mv;
                     END IF;
                 END
                 $$;
                 """)
             conn.commit()  
-        logger.info("✅ Successfully refreshed exam_stats_mv materialized view.")
+        record_refresh_duration('exam_stats_mv', time.perf_counter() - started)
     except Exception as e:
         logger.exception(f"❌ Failed Refreshing Dashboard Exam Data because {e}")
 
 def get_exam_data():
     exam_data = {}
     
-    exam_count_query = """
-        SELECT COUNT(DISTINCT exam_id) AS exam_count FROM exam_stats_mv;
-    """
-    published_count_query = """
-        SELECT COUNT(DISTINCT exam_id) AS published_count FROM exam_stats_mv WHERE is_published  = true;
-    """
-    unpublished_count_query = """
-        SELECT COUNT(DISTINCT exam_id) AS unpublished_count FROM exam_stats_mv WHERE is_published  = false;
+    exam_counts_query = """
+        SELECT
+            COUNT(DISTINCT exam_id) AS exam_count,
+            COUNT(DISTINCT exam_id) FILTER (WHERE is_published = true) AS published_count,
+            COUNT(DISTINCT exam_id) FILTER (WHERE is_published = false) AS unpublished_count
+        FROM exam_stats_mv;
     """
     examination_date_query =  """
         SELECT DISTINCT exam_id, exam_name, examination_date
@@ -76,22 +80,22 @@ def get_exam_data():
         ORDER BY exam_count ASC;
     """
     try:
-        with psycopg.connect(DATABASE_URL) as conn:
-            with conn.cursor() as cur:
-                exam_data['exam_count'] = fetch_single_value(cur, exam_count_query)
-
-                exam_data['published_count'] = fetch_single_value(cur, published_count_query)
+        with get_db_connection() as conn:
+            # pipeline mode: every statement goes out in one network round trip
+            with conn.pipeline():
+                counts_cur = conn.execute(exam_counts_query)
+                examination_date_cur = conn.execute(examination_date_query)
+                question_by_exam_cur = conn.execute(question_by_exam_query)
+                exam_by_course_cur = conn.execute(exam_by_course_query)
 
-                exam_data['unpublished_count'] = fetch_single_value(cur, unpublished_count_query)
+            exam_count, published_count, unpublished_count = counts_cur.fetchone()
+            exam_data['exam_count'] = exam_count or 0
+            exam_data['published_count'] = published_count or 0
+            exam_data['unpublished_count'] = unpublished_count or 0
 
-                cur.execute(examination_date_query)
-                exam_data['examination_dates'] = [list(row) for row in cur.fetchall()]
-
-                cur.execute(question_by_exam_query)
-                exam_data['question_exams'] = [list(row) for row in cur.fetchall()]
-                
-                cur.execute(exam_by_course_query)
-                exam_data['exam_courses'] = [list(row) for row in cur.fetchall()]
+            exam_data['examination_dates'] = [list(row) for row in examination_date_cur.fetchall()]
+            exam_data['question_exams'] = [list(row) for row in question_by_exam_cur.fetchall()]
+            exam_data['exam_courses'] = [list(row) for row in exam_by_course_cur.fetchall()]
                 
         return exam_data
 
@@ -102,115 +106,50 @@ def get_exam_data():
 def get_all_course_id():
     course_ids = []
     try:
-        with psycopg.connect(DATABASE_URL) as conn:
+        with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT course_id FROM course_subject_topic_question_mv")
+                cur.execute("SELECT DISTINCT course_id FROM dashboard_course_questions")
                 course_ids = [row[0] for row in cur.fetchall()]
             return course_ids
-        logger.info("✅ Successfully refreshed course_subject_topic_question_mv materialized view.")
-    except Exception as e:
-        logger.exception(f"❌ Failed Refreshing Dashboard Course Data because {e}")
-
-def refresh_course_data():
-    try:
-        with psycopg.connect(DATABASE_URL) as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                DO $$
-                BEGIN
-                IF NOT EXISTS (
-                    SELECT 1 FROM pg_matviews WHERE matviewname = 'course_subject_topic_question_mv'
-                ) THEN
-                CREATE MATERIALIZED VIEW course_subject_topic_question_mv AS
-                    SELECT DISTINCT
-                        c.id               AS course_id,
-                        c.abbreviation     AS course_abbreviation,
-                        s.id               AS subject_id,
-                        s.name             AS subject_name,
-                        t.id               AS topic_id,
-                        t.name             AS topic_name,
-                        q.id               AS question_id,
-                        q.question_type    AS question_type,
-                        q.name             AS question_name,
-                        STRING_AGG(DISTINCT tag.name, ', ') FILTER (
-                            WHERE taggable.taggable_type = 'App\Models\Question' 
-                            AND taggable.type = 'required'
-                        ) AS question_level,
-                        STRING_AGG(DISTINCT tag.name, ', ') FILTER (
-                            WHERE taggable.taggable_type = 'App\Models\Question'
-                            AND taggable.type = 'optional'
-                        ) AS optional_tags
-
-                    FROM courses c
-                    JOIN course_subject cs ON cs.course_id = c.id
-                    JOIN subjects s ON s.id = cs.subject_id
-                    JOIN topics t ON t.subject_id = s.id
-                    JOIN questions q ON q.topic_id = t.id
-
-                    LEFT JOIN taggables taggable 
-                        ON taggable.taggable_id = q.id 
-                        AND taggable.taggable_type = 'App\Models\Question'
-                    LEFT JOIN tags tag 
-                        ON tag.id = taggable.tag_id
-
-                    GROUP BY
-                        c.id, c.abbreviation,
-                        s.id, s.name,
-                        t.id, t.name,
-                        q.id, q.question_type, q.name;
-
-                CREATE INDEX idx_mv_course_id ON course_subject_topic_question_mv (course_id);
-                CREATE INDEX idx_mv_course_subject ON course_subject_topic_question_mv (course_id, subject_id);
-                CREATE INDEX idx_mv_course_topic ON course_subject_topic_question_mv (course_id, topic_id);
-                CREATE INDEX idx_mv_course_question_type ON course_subject_topic_question_mv (course_id, question_type);
-                ELSE
-                    REFRESH MATERIALIZED VIEW course_subject_topic_question_mv;
-                END IF;
-                END
-                $$;
-                """)
-            conn.commit()  
-        logger.info("✅ Successfully refreshed course_subject_topic_question_mv materialized view.")
     except Exception as e:
-        logger.exception(f"❌ Failed Refreshing Dashboard Course Data because {e}")
+        logger.exception(f"❌ Failed Getting Dashboard Course IDs because {e}")
 
 def get_course_data(course_id):
     course_data = {}
 
+    # counts come from the incrementally maintained dashboard_question_counts
     question_count_query = """
-        SELECT COUNT(question_id) AS question_count
-        FROM course_subject_topic_question_mv
+        SELECT COALESCE(SUM(question_count), 0)::bigint AS question_count
+        FROM dashboard_question_counts
         WHERE course_id = %s;
     """
     subject_query = """
         SELECT 
-            subject_id, 
-            subject_name, 
-            COUNT(question_id) AS question_count,
-            (SELECT COUNT(DISTINCT subject_id)
-                FROM course_subject_topic_question_mv
-                WHERE course_id = %s) AS subject_count
-        FROM course_subject_topic_question_mv
-        WHERE course_id = %s
-        GROUP BY subject_id, subject_name
+            dqc.subject_id, 
+            s.name AS subject_name, 
+            SUM(dqc.question_count)::bigint AS question_count,
+            COUNT(*) OVER () AS subject_count
+        FROM dashboard_question_counts dqc
+        JOIN subjects s ON s.id = dqc.subject_id
+        WHERE dqc.course_id = %s
+        GROUP BY dqc.subject_id, s.name
         ORDER BY question_count;
     """
     topic_query = """
         SELECT 
-            topic_id, 
-            topic_name, 
-            COUNT(question_id) AS question_count,
-            (SELECT COUNT(DISTINCT topic_id)
-                FROM course_subject_topic_question_mv
-                WHERE course_id = %s) AS topic_count
-        FROM course_subject_topic_question_mv
-        WHERE course_id = %s
-        GROUP BY topic_id, topic_name
+            dqc.topic_id, 
+            t.name AS topic_name, 
+            SUM(dqc.question_count)::bigint AS question_count,
+            COUNT(*) OVER () AS topic_count
+        FROM dashboard_question_counts dqc
+        JOIN topics t ON t.id = dqc.topic_id
+        WHERE dqc.course_id = %s
+        GROUP BY dqc.topic_id, t.name
         ORDER BY question_count;
     """
     question_type_query = """
-        select question_type, COUNT(question_id) AS question_count
-        from course_subject_topic_question_mv
+        select question_type, SUM(question_count)::bigint AS question_count
+        from dashboard_question_counts
         WHERE course_id = %s
         group by question_type
         ORDER BY question_count;
@@ -223,26 +162,20 @@ def get_course_data(course_id):
         WHERE ce.course_id = %s;
     """ 
     unused_questions_query ="""
-        SELECT COUNT(q.id) AS unused_questions
-        FROM questions q
-        JOIN course_subject_topic_question_mv mv
-        ON mv.question_id = q.id
-        WHERE mv.course_id = %s
-        AND NOT EXISTS (
-                SELECT 1
-                FROM exam_question eq
-                JOIN exams e ON eq.exam_id = e.id
-                JOIN course_exam ce ON ce.exam_id = eq.exam_id
-                WHERE eq.question_id = q.id
-                AND ce.course_id = %s
-        );
+        SELECT COUNT(dcq.question_id) AS unused_questions
+        FROM dashboard_course_questions dcq
+        LEFT JOIN dashboard_course_question_usage cqu
+        ON cqu.course_id = dcq.course_id
+        AND cqu.question_id = dcq.question_id
+        WHERE dcq.course_id = %s
+        AND cqu.question_id IS NULL;
     """
     reused_questions_query ="""
         SELECT 
             q.id AS question_id,
             q.name AS question_name,
             q.question_type,
-            mv.question_level,
+            dcq.question_level,
             
             CASE 
                 WHEN question_status.exam_count IS NULL THEN 'unused'
@@ -252,27 +185,23 @@ def get_course_data(course_id):
 
         FROM questions q
 
-        JOIN course_subject_topic_question_mv mv ON mv.question_id = q.id
-        LEFT JOIN (
-            SELECT eq.question_id, COUNT(DISTINCT eq.exam_id) AS exam_count
-            FROM exam_question eq
-            GROUP BY eq.question_id
-        ) question_status ON question_status.question_id = q.id
+        JOIN dashboard_course_questions dcq ON dcq.question_id = q.id
+        LEFT JOIN dashboard_question_usage question_status ON question_status.question_id = q.id
 
-        WHERE mv.course_id = %s;
+        WHERE dcq.course_id = %s;
     """
 
     try:
-        with psycopg.connect(DATABASE_URL) as conn:
+        with get_db_connection() as conn:
             with conn.cursor() as cur:
                 course_data['question_count'] = fetch_single_value(cur, question_count_query, (course_id,))
                 
-                cur.execute(subject_query, (course_id, course_id))
+                cur.execute(subject_query, (course_id,))
                 subject_rows = cur.fetchall()
                 course_data['subject_count'] = len(subject_rows)
                 course_data['subject_table'] = subject_rows
 
-                cur.execute(topic_query, (course_id, course_id))
+                cur.execute(topic_query, (course_id,))
                 topic_rows = cur.fetchall()
                 course_data['topic_count'] = len(topic_rows)
                 course_data['topic_table'] = topic_rows
@@ -284,7 +213,7 @@ def get_course_data(course_id):
 
                 course_data['exam_count'] = fetch_single_value(cur, exam_count_query, (course_id,))
 
-                course_data['unused_question_count'] = fetch_single_value(cur, unused_questions_query, (course_id, course_id))
+                course_data['unused_question_count'] = fetch_single_value(cur, unused_questions_query, (course_id,))
 
                 cur.execute(reused_questions_query, (course_id,))
                 reused_questions_rows = cur.fetchall()
@@ -297,6 +226,139 @@ def get_course_data(course_id):
         logger.exception(f"❌ Failed Getting Dashboard Course Data because {e}")
  
 
+def get_all_course_data():
+    # every course's dashboard from one pass over the views, grouped by course_id
+    # same shape per course as get_course_data
+    question_count_query = """
+        SELECT course_id, SUM(question_count)::bigint AS question_count
+        FROM dashboard_question_counts
+        GROUP BY course_id;
+    """
+    subject_query = """
+        SELECT
+            dqc.course_id,
+            dqc.subject_id,
+            s.name AS subject_name,
+            SUM(dqc.question_count)::bigint AS question_count,
+            COUNT(*) OVER (PARTITION BY dqc.course_id) AS subject_count
+        FROM dashboard_question_counts dqc
+        JOIN subjects s ON s.id = dqc.subject_id
+        GROUP BY dqc.course_id, dqc.subject_id, s.name
+        ORDER BY dqc.course_id, question_count;
+    """
+    topic_query = """
+        SELECT
+            dqc.course_id,
+            dqc.topic_id,
+            t.name AS topic_name,
+            SUM(dqc.question_count)::bigint AS question_count,
+            COUNT(*) OVER (PARTITION BY dqc.course_id) AS topic_count
+        FROM dashboard_question_counts dqc
+        JOIN topics t ON t.id = dqc.topic_id
+        GROUP BY dqc.course_id, dqc.topic_id, t.name
+        ORDER BY dqc.course_id, question_count;
+    """
+    question_type_query = """
+        SELECT course_id, question_type, SUM(question_count)::bigint AS question_count
+        FROM dashboard_question_counts
+        GROUP BY course_id, question_type
+        ORDER BY course_id, question_count;
+    """
+    exam_count_query = """
+        SELECT ce.course_id, COUNT(DISTINCT mv.exam_id) AS exam_count
+        FROM exam_stats_mv mv
+        JOIN course_exam ce ON ce.exam_id = mv.exam_id
+        GROUP BY ce.course_id;
+    """
+    unused_questions_query = """
+        SELECT dcq.course_id, COUNT(dcq.question_id) AS unused_questions
+        FROM dashboard_course_questions dcq
+        LEFT JOIN dashboard_course_question_usage cqu
+        ON cqu.course_id = dcq.course_id
+        AND cqu.question_id = dcq.question_id
+        WHERE cqu.question_id IS NULL
+        GROUP BY dcq.course_id;
+    """
+    reused_questions_query = """
+        SELECT
+            dcq.course_id,
+            q.id AS question_id,
+            q.name AS question_name,
+            q.question_type,
+            dcq.question_level,
+
+            CASE
+                WHEN question_status.exam_count IS NULL THEN 'unused'
+                WHEN question_status.exam_count = 1 THEN 'used'
+                ELSE 'reused'
+            END AS status
+
+        FROM questions q
+
+        JOIN dashboard_course_questions dcq ON dcq.question_id = q.id
+        LEFT JOIN dashboard_question_usage question_status ON question_status.question_id = q.id
+        ORDER BY dcq.course_id;
+    """
+
+    try:
+        with get_db_connection() as conn:
+            with conn.pipeline():
+                question_count_cur = conn.execute(question_count_query)
+                subject_cur = conn.execute(subject_query)
+                topic_cur = conn.execute(topic_query)
+                question_type_cur = conn.execute(question_type_query)
+                exam_count_cur = conn.execute(exam_count_query)
+                unused_questions_cur = conn.execute(unused_questions_query)
+                reused_questions_cur = conn.execute(reused_questions_query)
+
+            question_counts = dict(question_count_cur.fetchall())
+            subject_rows = group_rows_by_course(subject_cur.fetchall())
+            topic_rows = group_rows_by_course(topic_cur.fetchall())
+            question_type_rows = group_rows_by_course(question_type_cur.fetchall())
+            exam_counts = dict(exam_count_cur.fetchall())
+            unused_question_counts = dict(unused_questions_cur.fetchall())
+            reused_questions_rows = group_rows_by_course(reused_questions_cur.fetchall())
+
+        all_course_data = {}
+        for course_id, question_count in question_counts.items():
+            course_subjects = subject_rows.get(course_id, [])
+            course_topics = topic_rows.get(course_id, [])
+            course_question_types = question_type_rows.get(course_id, [])
+            course_reused_questions = reused_questions_rows.get(course_id, [])
+
+            all_course_data[course_id] = {
+                'question_count': question_count,
+                'subject_count': len(course_subjects),
+                'subject_table': course_subjects,
+                'topic_count': len(course_topics),
+                'topic_table': course_topics,
+                'question_type_count': len(course_question_types),
+                'question_type_table': course_question_types,
+                'exam_count': exam_counts.get(course_id, 0),
+                'unused_question_count': unused_question_counts.get(course_id, 0),
+                'reused_question_count': len(course_reused_questions),
+                'reused_questions': course_reused_questions,
+            }
+
+        return all_course_data
+
+    except Exception as e:
+        logger.exception(f"❌ Failed Getting Dashboard Data for all Courses because {e}")
+
+def group_rows_by_course(rows):
+    # rows start with course_id -> {course_id: [rest of row, ...]}
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row[0]].append(row[1:])
+    return grouped
+
+def record_refresh_duration(view_name, seconds):
+    logger.info(f"✅ Successfully refreshed {view_name} materialized view in {seconds:.2f}s.")
+    try:
+        redis_client.hset(MV_REFRESH_DURATIONS_KEY, view_name, round(seconds, 3))
+    except Exception as e:
+        logger.warning(f"Could not record refresh duration of {view_name}: {e}")
+
 def fetch_single_value(cur, query, params=()):
     cur.execute(query, params or ())
     result = cur.fetchone()
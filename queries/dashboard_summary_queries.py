@@ -0,0 +1,328 @@
+from collections import defaultdict
+from utils.logger import logger
+from utils.database_pool import get_db_connection
+
+# Summary tables behind the course dashboard, kept current from dashboard_change_log
+# instead of being recomputed from the base tables on every refresh.
+#   dashboard_question_counts: questions per course / subject / topic / question type
+#   dashboard_question_usage:  distinct exams per question
+#   dashboard_course_question_usage: distinct exams of a course per question
+#   dashboard_course_questions: per-question rows of the course dashboard (level tags),
+#                               replacing course_subject_topic_question_mv
+DASHBOARD_SUMMARY_LOCK_ID = 871_202_401
+
+# Changed entity kinds that make a view or a cache stale
+EXAM_MV_SOURCES = {'exam', 'question_usage', 'course'}
+COURSE_CACHE_SOURCES = {'question', 'topic', 'subject', 'question_tag', 'tag', 'course', 'question_usage', 'exam'}
+
+# (table, trigger suffix, entity kind, id column of the changed row)
+DASHBOARD_CHANGE_TRIGGERS = [
+    ('questions', 'topic', 'topic', 'topic_id'),
+    ('questions', 'question', 'question', 'id'),
+    ('topics', 'topic', 'topic', 'id'),
+    ('course_subject', 'subject', 'subject', 'subject_id'),
+    ('subjects', 'subject', 'subject', 'id'),
+    ('exam_question', 'usage', 'question_usage', 'question_id'),
+    ('exam_question', 'exam', 'exam', 'exam_id'),
+    ('exams', 'exam', 'exam', 'id'),
+    ('course_exam', 'exam', 'exam', 'exam_id'),
+    ('courses', 'course', 'course', 'id'),
+    ('taggables', 'tag', 'question_tag', 'taggable_id'),
+    # renaming a tag changes question_level of every question carrying it
+    ('tags', 'tag', 'tag', 'id'),
+]
+
+# Triggers of earlier releases that are no longer wanted, as (table, suffix)
+OBSOLETE_DASHBOARD_TRIGGERS = [
+    # question edits never change exam usage; deletes are logged through exam_question
+    ('questions', 'usage'),
+]
+
+create_summary_tables_query = """
+    CREATE TABLE IF NOT EXISTS dashboard_change_log (
+        id BIGSERIAL PRIMARY KEY,
+        entity TEXT NOT NULL,
+        entity_id BIGINT,
+        changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+
+    CREATE TABLE IF NOT EXISTS dashboard_question_counts (
+        course_id BIGINT NOT NULL,
+        subject_id BIGINT NOT NULL,
+        topic_id BIGINT NOT NULL,
+        question_type TEXT NOT NULL,
+        question_count BIGINT NOT NULL,
+        PRIMARY KEY (course_id, subject_id, topic_id, question_type)
+    );
+    CREATE INDEX IF NOT EXISTS idx_dashboard_question_counts_topic ON dashboard_question_counts (topic_id);
+
+    CREATE TABLE IF NOT EXISTS dashboard_question_usage (
+        question_id BIGINT PRIMARY KEY,
+        exam_count BIGINT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS dashboard_course_question_usage (
+        course_id BIGINT NOT NULL,
+        question_id BIGINT NOT NULL,
+        exam_count BIGINT NOT NULL,
+        PRIMARY KEY (course_id, question_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_dashboard_course_question_usage_question ON dashboard_course_question_usage (question_id);
+
+    CREATE TABLE IF NOT EXISTS dashboard_course_questions (
+        course_id BIGINT NOT NULL,
+        subject_id BIGINT NOT NULL,
+        topic_id BIGINT NOT NULL,
+        question_id BIGINT NOT NULL,
+        question_level TEXT,
+        optional_tags TEXT,
+        PRIMARY KEY (course_id, question_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_dashboard_course_questions_question ON dashboard_course_questions (question_id);
+    CREATE INDEX IF NOT EXISTS idx_dashboard_course_questions_subject ON dashboard_course_questions (subject_id);
+    CREATE INDEX IF NOT EXISTS idx_dashboard_course_questions_topic ON dashboard_course_questions (topic_id);
+
+    CREATE OR REPLACE FUNCTION dashboard_log_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO dashboard_change_log (entity, entity_id)
+            VALUES (TG_ARGV[0], (to_jsonb(OLD) ->> TG_ARGV[1])::bigint);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO dashboard_change_log (entity, entity_id)
+            VALUES (TG_ARGV[0], (to_jsonb(NEW) ->> TG_ARGV[1])::bigint);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+"""
+
+create_trigger_query = """
+    DROP TRIGGER IF EXISTS trg_dashboard_{table}_{suffix} ON {table};
+    CREATE TRIGGER trg_dashboard_{table}_{suffix}
+        AFTER INSERT OR UPDATE OR DELETE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION dashboard_log_change('{entity}', '{id_column}');
+"""
+
+# %(topic_ids)s = NULL rebuilds every topic
+delete_question_counts_query = """
+    DELETE FROM dashboard_question_counts
+    WHERE %(topic_ids)s::bigint[] IS NULL OR topic_id = ANY(%(topic_ids)s::bigint[]);
+"""
+insert_question_counts_query = """
+    INSERT INTO dashboard_question_counts (course_id, subject_id, topic_id, question_type, question_count)
+    SELECT cs.course_id, t.subject_id, t.id, q.question_type, COUNT(DISTINCT q.id)
+    FROM topics t
+    JOIN course_subject cs ON cs.subject_id = t.subject_id
+    JOIN questions q ON q.topic_id = t.id
+    WHERE %(topic_ids)s::bigint[] IS NULL OR t.id = ANY(%(topic_ids)s::bigint[])
+    GROUP BY cs.course_id, t.subject_id, t.id, q.question_type;
+"""
+
+# %(question_ids)s = NULL rebuilds every question
+delete_question_usage_query = """
+    DELETE FROM dashboard_question_usage
+    WHERE %(question_ids)s::bigint[] IS NULL OR question_id = ANY(%(question_ids)s::bigint[]);
+"""
+insert_question_usage_query = """
+    INSERT INTO dashboard_question_usage (question_id, exam_count)
+    SELECT eq.question_id, COUNT(DISTINCT eq.exam_id)
+    FROM exam_question eq
+    WHERE %(question_ids)s::bigint[] IS NULL OR eq.question_id = ANY(%(question_ids)s::bigint[])
+    GROUP BY eq.question_id;
+"""
+
+delete_course_question_usage_query = """
+    DELETE FROM dashboard_course_question_usage
+    WHERE %(question_ids)s::bigint[] IS NULL OR question_id = ANY(%(question_ids)s::bigint[]);
+"""
+insert_course_question_usage_query = """
+    INSERT INTO dashboard_course_question_usage (course_id, question_id, exam_count)
+    SELECT ce.course_id, eq.question_id, COUNT(DISTINCT eq.exam_id)
+    FROM exam_question eq
+    JOIN exams e ON e.id = eq.exam_id
+    JOIN course_exam ce ON ce.exam_id = eq.exam_id
+    WHERE %(question_ids)s::bigint[] IS NULL OR eq.question_id = ANY(%(question_ids)s::bigint[])
+    GROUP BY ce.course_id, eq.question_id;
+"""
+
+# %(question_ids)s = NULL rebuilds every question
+delete_course_questions_query = """
+    DELETE FROM dashboard_course_questions
+    WHERE %(question_ids)s::bigint[] IS NULL OR question_id = ANY(%(question_ids)s::bigint[]);
+"""
+insert_course_questions_query = """
+    INSERT INTO dashboard_course_questions (course_id, subject_id, topic_id, question_id, question_level, optional_tags)
+    SELECT
+        cs.course_id, t.subject_id, t.id, q.id,
+        STRING_AGG(DISTINCT tag.name, ', ') FILTER (WHERE taggable.type = 'required') AS question_level,
+        STRING_AGG(DISTINCT tag.name, ', ') FILTER (WHERE taggable.type = 'optional') AS optional_tags
+    FROM questions q
+    JOIN topics t ON t.id = q.topic_id
+    JOIN course_subject cs ON cs.subject_id = t.subject_id
+    JOIN courses c ON c.id = cs.course_id
+    LEFT JOIN taggables taggable
+        ON taggable.taggable_id = q.id
+        AND taggable.taggable_type = 'App\\Models\\Question'
+    LEFT JOIN tags tag ON tag.id = taggable.tag_id
+    WHERE %(question_ids)s::bigint[] IS NULL OR q.id = ANY(%(question_ids)s::bigint[])
+    GROUP BY cs.course_id, t.subject_id, t.id, q.id;
+"""
+
+# questions whose course rows a change of topics / subjects / courses / tags can touch:
+# the rows stored now plus the questions found under them in the base tables
+affected_questions_queries = {
+    'topic': """
+        SELECT question_id FROM dashboard_course_questions WHERE topic_id = ANY(%(ids)s::bigint[])
+        UNION
+        SELECT id FROM questions WHERE topic_id = ANY(%(ids)s::bigint[])
+    """,
+    'subject': """
+        SELECT question_id FROM dashboard_course_questions WHERE subject_id = ANY(%(ids)s::bigint[])
+        UNION
+        SELECT q.id FROM questions q JOIN topics t ON t.id = q.topic_id WHERE t.subject_id = ANY(%(ids)s::bigint[])
+    """,
+    'course': """
+        SELECT question_id FROM dashboard_course_questions WHERE course_id = ANY(%(ids)s::bigint[])
+        UNION
+        SELECT q.id FROM questions q
+        JOIN topics t ON t.id = q.topic_id
+        JOIN course_subject cs ON cs.subject_id = t.subject_id
+        WHERE cs.course_id = ANY(%(ids)s::bigint[])
+    """,
+    'tag': """
+        SELECT DISTINCT taggable_id FROM taggables
+        WHERE tag_id = ANY(%(ids)s::bigint[]) AND taggable_type = 'App\\Models\\Question'
+    """,
+}
+
+def recompute_question_counts(cur, topic_ids=None):
+    params = {'topic_ids': topic_ids}
+    cur.execute(delete_question_counts_query, params)
+    cur.execute(insert_question_counts_query, params)
+
+def recompute_question_usage(cur, question_ids=None):
+    params = {'question_ids': question_ids}
+    cur.execute(delete_question_usage_query, params)
+    cur.execute(insert_question_usage_query, params)
+    recompute_course_question_usage(cur, question_ids)
+
+def recompute_course_question_usage(cur, question_ids=None):
+    params = {'question_ids': question_ids}
+    cur.execute(delete_course_question_usage_query, params)
+    cur.execute(insert_course_question_usage_query, params)
+
+def recompute_course_questions(cur, question_ids=None):
+    params = {'question_ids': question_ids}
+    cur.execute(delete_course_questions_query, params)
+    cur.execute(insert_course_questions_query, params)
+
+def get_affected_question_ids(cur, entity, ids):
+    cur.execute(affected_questions_queries[entity], {'ids': list(ids)})
+    return {row[0] for row in cur.fetchall()}
+
+existing_triggers_query = """
+    SELECT c.relname, t.tgname, t.tgargs
+    FROM pg_trigger t
+    JOIN pg_class c ON c.oid = t.tgrelid
+    WHERE NOT t.tgisinternal AND t.tgname LIKE 'trg\\_dashboard\\_%'
+"""
+
+def ensure_change_triggers(cur):
+    # DROP/CREATE TRIGGER lock the core tables, so only touch triggers that are missing or changed
+    cur.execute(existing_triggers_query)
+    existing = {(table, name): bytes(args) for table, name, args in cur.fetchall()}
+
+    for table, suffix, entity, id_column in DASHBOARD_CHANGE_TRIGGERS:
+        # tgargs holds the trigger arguments, each NUL terminated
+        if existing.get((table, f"trg_dashboard_{table}_{suffix}")) != f"{entity}\0{id_column}\0".encode():
+            cur.execute(create_trigger_query.format(table=table, suffix=suffix, entity=entity, id_column=id_column))
+            logger.info(f"🛠️ Installed dashboard change trigger on {table} ({entity})")
+
+    for table, suffix in OBSOLETE_DASHBOARD_TRIGGERS:
+        if (table, f"trg_dashboard_{table}_{suffix}") in existing:
+            cur.execute(f"DROP TRIGGER trg_dashboard_{table}_{suffix} ON {table}")
+            logger.info(f"🛠️ Removed obsolete dashboard change trigger trg_dashboard_{table}_{suffix}")
+
+def ensure_dashboard_summary():
+    # create summary tables and change triggers once, backfilling them on first creation
+    # existing triggers are left alone, so a routine boot takes no lock on the core tables
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (DASHBOARD_SUMMARY_LOCK_ID,))
+                cur.execute("""
+                    SELECT  to_regclass('dashboard_question_counts') IS NULL,
+                            to_regclass('dashboard_course_question_usage') IS NULL,
+                            to_regclass('dashboard_course_questions') IS NULL
+                """)
+                is_new, is_new_course_usage, is_new_course_questions = cur.fetchone()
+
+                cur.execute(create_summary_tables_query)
+                ensure_change_triggers(cur)
+
+                if is_new:
+                    recompute_question_counts(cur)
+                    recompute_question_usage(cur)
+                elif is_new_course_usage:
+                    recompute_course_question_usage(cur)
+                if is_new_course_questions:
+                    recompute_course_questions(cur)
+                    # its rows replace this view, which nothing reads any more
+                    cur.execute("DROP MATERIALIZED VIEW IF EXISTS course_subject_topic_question_mv")
+
+            conn.commit()
+        logger.info("✅ Dashboard summary tables and change triggers are in place.")
+    except Exception as e:
+        logger.exception(f"❌ Failed Preparing Dashboard Summary Tables because {e}")
+
+def apply_dashboard_changes():
+    # consume dashboard_change_log and recompute only the summary rows it touches
+    # returns the changed entity kinds, or None if nothing could be applied
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # one consumer at a time across API replicas
+                cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (DASHBOARD_SUMMARY_LOCK_ID,))
+                if not cur.fetchone()[0]:
+                    return set()
+
+                cur.execute("DELETE FROM dashboard_change_log RETURNING entity, entity_id")
+                changes = defaultdict(set)
+                for entity, entity_id in cur.fetchall():
+                    if entity_id is not None:
+                        changes[entity].add(entity_id)
+
+                topic_ids = set(changes['topic'])
+                if changes['subject']:
+                    cur.execute("SELECT id FROM topics WHERE subject_id = ANY(%s::bigint[])", (list(changes['subject']),))
+                    topic_ids.update(row[0] for row in cur.fetchall())
+
+                if topic_ids:
+                    recompute_question_counts(cur, list(topic_ids))
+                # publishing, editing or moving an exam changes the per-course usage of its questions
+                question_ids = set(changes['question_usage'])
+                if changes['exam']:
+                    cur.execute("SELECT DISTINCT question_id FROM exam_question WHERE exam_id = ANY(%s::bigint[])", (list(changes['exam']),))
+                    question_ids.update(row[0] for row in cur.fetchall())
+
+                if question_ids:
+                    recompute_question_usage(cur, list(question_ids))
+
+                # per-question course rows: edited or re-tagged questions plus everything under changed parents
+                course_question_ids = set(changes['question']) | set(changes['question_tag'])
+                for entity in ('topic', 'subject', 'course', 'tag'):
+                    if changes[entity]:
+                        course_question_ids |= get_affected_question_ids(cur, entity, changes[entity])
+                if course_question_ids:
+                    recompute_course_questions(cur, list(course_question_ids))
+
+            conn.commit()
+
+        changed = {entity for entity, entity_ids in changes.items() if entity_ids}
+        logger.info(f"✅ Applied dashboard changes: { {entity: len(changes[entity]) for entity in changed} }")
+        return changed
+
+    except Exception as e:
+        logger.exception(f"❌ Failed Applying Dashboard Changes because {e}")
+        return None
@@ -1,191 +1,209 @@
-import os
-import psycopg
 import json
 from datetime import datetime, timezone
 from utils.logger import logger
+from utils.database_pool import get_db_connection
 from utils.redis_client import redis_client
-
-DATABASE_URL = f"postgresql://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_DATABASE')}"
+from utils.report_cache import bump_report_versions
 
 STUDENT_CODE_ANSWER_UPDATE_HASH = "checked_code"
 CODE_ANSWER_CHECKED = "checked"
 
+CODING_ANSWER_UPDATE_QUERY =    """
+                                UPDATE coding_answers
+                                SET status = %s,
+                                    answer_syntax_points = %s,
+                                    answer_runtime_points = %s,
+                                    answer_test_case_points = %s,
+                                    is_code_success = %s,
+                                    test_results = %s,
+                                    failures = %s
+                                WHERE id = %s
+                                """
+
+STUDENT_ANSWER_UPDATE_QUERY =   """
+                                UPDATE student_answers
+                                SET points = %s,
+                                    is_answered = %s,
+                                    is_correct = %s
+                                WHERE id = %s
+                                """
+
 def update_answer_points(coding_answer_id, result, answer_id):
     # update student points for code answers and total points
     logger.info(f"🛠️ Entering update_answer_points for {coding_answer_id}")
-    logger.info(f"Raw result: {result}")
+    update_answers_points([(coding_answer_id, result, answer_id)])
+
+def update_answers_points(graded_answers):
+    # update every graded coding answer of a paper in one transaction
+    # graded_answers: list of (coding_answer_id, result, answer_id)
+    logger.info(f"🛠️ Entering update_answers_points for {len(graded_answers)} answers")
+
+    coding_answer_rows = []
+    student_answer_rows = []
+    checked_ids = []
+    for coding_answer_id, result, answer_id in graded_answers:
+        try:
+            coding_answer_row, student_answer_row = get_answer_points_rows(coding_answer_id, result, answer_id)
+        except Exception as e:
+            logger.exception(f"❌ Invalid result for coding answer ID {coding_answer_id} because {e}")
+            continue
+        coding_answer_rows.append(coding_answer_row)
+        student_answer_rows.append(student_answer_row)
+        checked_ids.append(coding_answer_id)
+
+    if not checked_ids:
+        return
 
     try:
-        # Fields for updating CodingAnswer
-        is_code_success = result['success']
-        test_results = json.dumps(result['testResults'])
-        failures = json.dumps(result['failures'])
-
-        points = result['points'][0] 
-        answer_syntax_points = points['syntax']
-        answer_runtime_points = points['runtime']
-        answer_test_case_points = points['testcase']
-
-        coding_answer_update_query =    """
-                                        UPDATE coding_answers
-                                        SET status = %s,
-                                            answer_syntax_points = %s,
-                                            answer_runtime_points = %s,
-                                            answer_test_case_points = %s,
-                                            is_code_success = %s,
-                                            test_results = %s,
-                                            failures = %s
-                                        WHERE id = %s
-                                        """
-
-        # Fields for updating StudentAnswer
-        total_points = int(points['syntax']) + int(points['runtime']) + int(points['testcase'])
-        is_answered= True
-        is_correct = result['success']
-        student_answer_update_query =   """
-                                        UPDATE student_answers
-                                        SET points = %s,
-                                            is_answered = %s,
-                                            is_correct = %s
-                                        WHERE id = %s
-                                        """
-
-        status = 'checked'
-        with psycopg.connect(DATABASE_URL) as conn:
+        with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    coding_answer_update_query,
-                    (
-                        status,
-                        answer_syntax_points,
-                        answer_runtime_points,
-                        answer_test_case_points,
-                        is_code_success,
-                        test_results,
-                        failures,
-                        coding_answer_id
-                    )
-                )
-                cur.execute(
-                   student_answer_update_query,
-                    (
-                        total_points,
-                        is_answered,
-                        is_correct,
-                        answer_id
-                    )
-                )
-                logger.info(f"✅ Updated coding_answer for ID {coding_answer_id} and answer_id for {answer_id}")
+                cur.executemany(CODING_ANSWER_UPDATE_QUERY, coding_answer_rows)
+                cur.executemany(STUDENT_ANSWER_UPDATE_QUERY, student_answer_rows)
+                logger.info(f"✅ Updated coding_answers {checked_ids}")
 
             conn.commit()
-            redis_client.hset(STUDENT_CODE_ANSWER_UPDATE_HASH, coding_answer_id, CODE_ANSWER_CHECKED)
+
+        with redis_client.pipeline(transaction=False) as pipe:
+            for coding_answer_id in checked_ids:
+                pipe.hset(STUDENT_CODE_ANSWER_UPDATE_HASH, coding_answer_id, CODE_ANSWER_CHECKED)
+            pipe.execute()
 
     except Exception as e:
-        logger.exception(f"❌ update_answer_points failed for ID {coding_answer_id} because {e}")
-     
+        # re-raised so the caller leaves the paper pending instead of acking it ungraded
+        logger.exception(f"❌ update_answers_points failed for IDs {checked_ids} because {e}")
+        raise
+
+def get_answer_points_rows(coding_answer_id, result, answer_id):
+    logger.info(f"Raw result: {result}")
+
+    # Fields for updating CodingAnswer
+    is_code_success = result['success']
+    test_results = json.dumps(result['testResults'])
+    failures = json.dumps(result['failures'])
+
+    points = result['points'][0] 
+    answer_syntax_points = points['syntax']
+    answer_runtime_points = points['runtime']
+    answer_test_case_points = points['testcase']
+
+    # Fields for updating StudentAnswer
+    total_points = int(points['syntax']) + int(points['runtime']) + int(points['testcase'])
+    is_answered= True
+    is_correct = result['success']
+
+    status = 'checked'
+    coding_answer_row = (
+        status,
+        answer_syntax_points,
+        answer_runtime_points,
+        answer_test_case_points,
+        is_code_success,
+        test_results,
+        failures,
+        coding_answer_id
+    )
+    student_answer_row = (
+        total_points,
+        is_answered,
+        is_correct,
+        answer_id
+    )
+    return coding_answer_row, student_answer_row
+
 def update_exam_record(student_paper_id):
     # update student exam record after grading coding answer
+    # lookup, max score, subject sums and both updates run as one statement
     logger.info(f"🛠️ Updating Exam Record for paper {student_paper_id}")
 
-    get_answers_by_subjects_query = """
-                                    SELECT  subjects.id as id, 
-                                            subjects.name as subject_name, 
-                                            SUM(student_answers.points) as subject_score_obtained
-                                    FROM student_answers
-                                    JOIN questions ON student_answers.question_id = questions.id
-                                    JOIN topics ON questions.topic_id = topics.id
-                                    JOIN subjects ON topics.subject_id = subjects.id 
-                                    WHERE student_answers.student_paper_id = %s
-                                    GROUP BY subjects.id, subjects.name
-                                    """
-    
-    get_exam_record_query = """
-                            SELECT id
-                            FROM exam_records
-                            WHERE student_paper_id = %s
-                            """
-    
-    update_exam_record_query = """
-                                UPDATE exam_records
-                                SET 
-                                    total_score = %s, 
-                                    status = %s
-                                WHERE exam_records.id = %s
-                                """
-    
-    get_exam_max_score_query =  """
-                                SELECT exams.max_score, exams.passing_score
+    updated = update_exam_records([student_paper_id])
+    if updated == []:
+        logger.error(f"❌ update_exam_record found no exam record for student_paper {student_paper_id}")
+    return updated
+
+UPDATE_EXAM_RECORDS_QUERY = """
+                            WITH records AS (
+                                SELECT  exam_records.id AS exam_record_id,
+                                        exam_records.student_paper_id,
+                                        exams.id AS exam_id,
+                                        exams.max_score,
+                                        exams.passing_score
                                 FROM exam_records
                                 JOIN student_papers ON exam_records.student_paper_id = student_papers.id
                                 JOIN exams ON student_papers.exam_id = exams.id
-                                WHERE exam_records.id = %s
-                                """
+                                WHERE exam_records.student_paper_id = ANY(%(student_paper_ids)s::bigint[])
+                            ),
+                            subject_scores AS (
+                                SELECT  records.exam_record_id,
+                                        subjects.id AS subject_id,
+                                        COALESCE(SUM(student_answers.points), 0) AS score_obtained
+                                FROM records
+                                JOIN student_answers ON student_answers.student_paper_id = records.student_paper_id
+                                JOIN questions ON student_answers.question_id = questions.id
+                                JOIN topics ON questions.topic_id = topics.id
+                                JOIN subjects ON topics.subject_id = subjects.id
+                                GROUP BY records.exam_record_id, subjects.id
+                            ),
+                            updated_subjects AS (
+                                UPDATE exam_records_subjects
+                                SET
+                                    score_obtained = subject_scores.score_obtained,
+                                    updated_at = %(updated_at)s
+                                FROM subject_scores
+                                WHERE exam_records_subjects.exam_record_id = subject_scores.exam_record_id
+                                AND exam_records_subjects.subject_id = subject_scores.subject_id
+                            ),
+                            totals AS (
+                                SELECT  records.exam_record_id,
+                                        records.exam_id,
+                                        records.max_score,
+                                        records.passing_score,
+                                        COALESCE(SUM(subject_scores.score_obtained), 0) AS total_score
+                                FROM records
+                                LEFT JOIN subject_scores ON subject_scores.exam_record_id = records.exam_record_id
+                                GROUP BY records.exam_record_id, records.exam_id, records.max_score, records.passing_score
+                            )
+                            UPDATE exam_records
+                            SET
+                                total_score = totals.total_score,
+                                updated_at = %(updated_at)s,
+                                status = CASE
+                                    WHEN totals.max_score = 0 THEN 'more_review'
+                                    WHEN totals.total_score = totals.max_score THEN 'perfect_score'
+                                    WHEN totals.total_score >= totals.max_score * (totals.passing_score / 100.0) THEN 'pass'
+                                    ELSE 'more_review'
+                                END
+                            FROM totals
+                            WHERE exam_records.id = totals.exam_record_id
+                            RETURNING exam_records.id, exam_records.student_paper_id, totals.exam_id
+                            """
+
+def update_exam_records(student_paper_ids):
+    # recompute the exam records of many student papers in one set-based statement
+    # status rules mirror get_exam_record_status
+    logger.info(f"🛠️ Updating Exam Records for {len(student_paper_ids)} papers")
 
-    update_subject_scores_query =   """
-                                    UPDATE exam_records_subjects
-                                    SET
-                                        score_obtained = %s,
-                                        updated_at = %s
-                                    WHERE exam_record_id = %s
-                                    AND subject_id = %s
-                                    """
     try:
-        with psycopg.connect(DATABASE_URL) as conn:
-            with conn.cursor(row_factory=psycopg.rows.dict_row) as cur:
-                logger.info(f"Updating exam subject scores for student paper id: {student_paper_id}")
-                cur.execute(get_exam_record_query, (student_paper_id,))
-                row = cur.fetchone()
-                if not row:
-                    raise ValueError("No exam record found for student_paper_id")
-                
-                exam_record_id = row['id']
-
-                cur.execute(get_exam_max_score_query, (exam_record_id,))
-                row = cur.fetchone()
-                if not row:
-                    raise ValueError("No max score found for exam record")
-                
-                exam_max_score = row['max_score']
-                exam_passing_score = row['passing_score']
-
-                cur.execute(get_answers_by_subjects_query, (student_paper_id,))
-                rows = cur.fetchall()
-
-                now = datetime.now(timezone.utc)
-                transformed = [
-                    {
-                        'exam_record_id': exam_record_id,
-                        'subject_id': row['id'],
-                        'subject_score_obtained': row['subject_score_obtained'],
-                        'updated_at': now
-                    }
-                    for row in rows
-                ]   
-
-                total_score = sum(row['subject_score_obtained'] for row in transformed)
-                status = get_exam_record_status(total_score, exam_max_score, exam_passing_score)
-
-                logger.info("ATTEMPTING TO UPDATE SUBJECT SCORES NOW")
-                cur.executemany(update_subject_scores_query, [
-                    (
-                        row['subject_score_obtained'],
-                        row['updated_at'],
-                        row['exam_record_id'],
-                        row['subject_id']
-                    )
-                    for row in transformed
-                ])
-
-                logger.info("ATTEMPTING TO UPDATE EXAM RECORD")
-                cur.execute(update_exam_record_query, (total_score, status, exam_record_id))
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(UPDATE_EXAM_RECORDS_QUERY, {
+                    'student_paper_ids': list(student_paper_ids),
+                    'updated_at': datetime.now(timezone.utc)
+                })
+                updated = cur.fetchall()
 
             conn.commit()
-            logger.info(f"✅ Updated exam_record for ID {exam_record_id}")
+            logger.info(f"✅ Updated {len(updated)} exam_records")
+
+        # regraded exams get a new report version, their cached reports go stale
+        bump_report_versions(exam_id for _, _, exam_id in updated)
+        return updated
 
     except Exception as e:
-        logger.exception(f"❌ update_exam_record failed for ID of student_paper {student_paper_id} because {e}")
+        logger.exception(f"❌ update_exam_records failed for student_papers {student_paper_ids} because {e}")
+        return None
 
 def get_exam_record_status(score_obtained: int, max_score: int, passing_score: int) -> str:
+    # reference for the status CASE in UPDATE_EXAM_RECORDS_QUERY, not used on the grading path
     if max_score == 0:
         return "more_review"  
 
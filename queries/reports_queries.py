@@ -1,6 +1,10 @@
-import psycopg
-from utils.database_config import DATABASE_URL
+import os
+import hashlib
+import polars as pl
+from concurrent.futures import ThreadPoolExecutor
+from utils.database_pool import get_db_connection, get_arrow_db_connection
 from utils.logger import logger
+from utils.report_cache import get_report_version
 
 def get_exam_data():
     exam_data = {}
@@ -15,4 +19,127 @@ def get_exam_data():
 
     except Exception as e:
         logger.exception(f"❌ Failed Getting Dashboard Exam Data because {e}")
-    
\ No newline at end of file
+    
+# student_performances columns a report may read: SQL cast and the Polars dtype it loads as
+STUDENT_PERFORMANCE_COLUMNS = {
+    'exam_id': ('bigint', pl.Int64),
+    'user_id': ('bigint', pl.Int64),
+    'attempt': ('integer', pl.Int32),
+    'student_name': ('text', pl.String),
+    'student_email': ('text', pl.String),
+    'course_id': ('bigint', pl.Int64),
+    'course_abbreviation': ('text', pl.String),
+    'subject_id': ('bigint', pl.Int64),
+    'subject_name': ('text', pl.String),
+    'topic_id': ('bigint', pl.Int64),
+    'topic_name': ('text', pl.String),
+    'question_id': ('bigint', pl.Int64),
+    'question_name': ('text', pl.String),
+    'question_type': ('text', pl.String),
+    'question_level': ('text', pl.String),
+    # points may be numeric (partial credit), never truncate them to integers
+    'question_points': ('double precision', pl.Float64),
+    'points_obtained': ('double precision', pl.Float64),
+    'is_answered': ('boolean', pl.Boolean),
+    'is_correct': ('boolean', pl.Boolean),
+    'first_viewed_at': ('timestamptz', pl.Datetime('us', 'UTC')),
+    'first_answered_at': ('timestamptz', pl.Datetime('us', 'UTC')),
+    'last_answered_at': ('timestamptz', pl.Datetime('us', 'UTC')),
+}
+
+STUDENT_STATUS_SCHEMA = {
+    'user_id': pl.Int64,
+    'attempt': pl.Int32,
+    'status': pl.String,
+}
+
+# Latest exam record of every student who took the exam. The student list is a
+# join on exam_id, so the query text is the same for every exam and class size.
+# Report frames load over ADBC, which binds positional $n parameters.
+get_student_statuses_query = """
+    SELECT DISTINCT ON (sp.user_id)
+        sp.user_id::bigint AS user_id,
+        er.attempt::integer AS attempt,
+        er.status::text AS status
+    FROM exam_records er
+    JOIN student_papers sp ON sp.id = er.student_paper_id
+    WHERE sp.exam_id = $1
+    ORDER BY sp.user_id, er.created_at DESC
+"""
+
+# Cheap summary of everything a report reads that the main app may change without
+# going through the code checker: new papers, new or re-scored records, exam edits.
+get_report_fingerprint_query = """
+    SELECT
+        (SELECT e.updated_at FROM exams e WHERE e.id = %(exam_id)s) AS exam_updated_at,
+        COUNT(DISTINCT sp.id) AS paper_count,
+        MAX(sp.updated_at) AS paper_updated_at,
+        COUNT(er.id) AS record_count,
+        MAX(er.updated_at) AS record_updated_at
+    FROM student_papers sp
+    LEFT JOIN exam_records er ON er.student_paper_id = sp.id
+    WHERE sp.exam_id = %(exam_id)s
+"""
+
+# the performances and statuses of one report load side by side, each on its own pooled connection
+report_query_pool = ThreadPoolExecutor(max_workers=int(os.getenv("REPORT_QUERY_THREADS", 4)), thread_name_prefix="report-query")
+
+
+def build_student_performances_query(columns) -> str:
+    # the select list only varies with the strategies in use, never with the exam
+    select_list = ",\n            ".join(
+        f"sp.{column}::{STUDENT_PERFORMANCE_COLUMNS[column][0]} AS {column}" for column in columns
+    )
+    return f"""
+        SELECT
+            {select_list}
+        FROM student_performances sp
+        WHERE sp.exam_id = $1
+    """
+
+def read_report_frame(query: str, params: list, schema_overrides: dict) -> pl.DataFrame:
+    # ADBC binds the parameters server-side and hands Polars an Arrow table, no per-row Python objects
+    with get_arrow_db_connection() as conn:
+        return pl.read_database(
+            query=query,
+            connection=conn,
+            execute_options={'parameters': params},
+            schema_overrides=schema_overrides
+        )
+
+def get_student_performances(exam_id: int, columns) -> pl.DataFrame:
+    return read_report_frame(
+        build_student_performances_query(columns),
+        [exam_id],
+        {column: STUDENT_PERFORMANCE_COLUMNS[column][1] for column in columns}
+    )
+
+def get_student_statuses(exam_id: int) -> pl.DataFrame:
+    return read_report_frame(get_student_statuses_query, [exam_id], STUDENT_STATUS_SCHEMA)
+
+def get_report_data_version(exam_id: int):
+    # grading counter + data fingerprint; None when either is unavailable, the report is then not cached
+    counter = get_report_version(exam_id)
+    if counter is None:
+        return None
+
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(get_report_fingerprint_query, {'exam_id': exam_id})
+                fingerprint = cur.fetchone()
+    except Exception as e:
+        logger.exception(f"❌ Failed Getting Report Fingerprint for exam {exam_id} because {e}")
+        return None
+
+    return f"{counter}-{hashlib.blake2b(repr(fingerprint).encode(), digest_size=8).hexdigest()}"
+
+def get_report_frames(exam_id: int, columns):
+    # (student performances, latest student statuses), fetched concurrently
+    statuses = report_query_pool.submit(get_student_statuses, exam_id)
+    try:
+        performances = get_student_performances(exam_id, columns)
+    except Exception:
+        statuses.cancel()
+        raise
+    return performances, statuses.result()
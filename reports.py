@@ -1,10 +1,11 @@
-from fastapi import APIRouter
-import polars as pl
+from fastapi import APIRouter, Request
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from utils.logger import logger
 from utils.redis_client import redis_client
-from utils.database_config import DATABASE_URL
+from utils.encoded_body import EncodedBody, conditional_response, etag_matches, not_modified_response
+from utils.report_cache import get_cached_report, cache_report, get_report_etag
+from queries.reports_queries import get_report_data_version
 from handlers.reports_interface import Context
 from handlers.reports_strategy import CalculateExamOverview, CalculateExamDescriptiveStatistics, CalculateExamHistogramBoxplot, CalculateExamBySubjectsAndTopics, CalculateExamBYTypeWithLevels, CalculateExamQuestionHeatStrip, CalculateIndividualQuestionAnalysis, CalculateIndividualStudentPerformance
 from typing import Dict, Any, List
@@ -13,17 +14,22 @@ router = APIRouter()
 
 # System Section 
 @router.get("/create-store/{exam_id}")
-def initial_load_create_store(exam_id : int):
+def initial_load_create_store(exam_id : int, request: Request):
+    # reports are cached per exam data version: regrades bump it, new papers and edits change its fingerprint
+    version = get_report_data_version(exam_id)
+    etag = None
+    if version is not None:
+        # a client holding this version is answered before the cached body is fetched
+        etag = get_report_etag(exam_id, version)
+        if etag_matches(request.headers.get('if-none-match', ''), etag):
+            return not_modified_response(etag)
 
-    get_student_performances_query = f"""
-        SELECT *
-        FROM student_performances sp
-        WHERE exam_id = {exam_id}
-    """
+        cached_report = get_cached_report(exam_id, version)
+        if cached_report is not None:
+            return conditional_response(request, cached_report)
 
-    student_performance_df = pl.read_database_uri(query=get_student_performances_query, uri=DATABASE_URL)
     context = Context(
-                df=student_performance_df, 
+                exam_id=exam_id, 
                 strategies=[
                     CalculateExamOverview(),
                     CalculateExamDescriptiveStatistics(),
@@ -37,7 +43,12 @@ def initial_load_create_store(exam_id : int):
     
     exam_performance = context.do_business_logic()
 
-    return exam_performance
+    # uncacheable reports (no version) fall back to a content hash ETag
+    report = EncodedBody.encode(exam_performance, 0, etag)
+    if version is not None:
+        cache_report(exam_id, version, report)
+
+    return conditional_response(request, report)
 
 @router.get("/example/{exam_id}")
 def initial_load_create_store(exam_id : int):
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+import polars as pl
+import pytest
+from queries.reports_queries import STUDENT_PERFORMANCE_COLUMNS, STUDENT_STATUS_SCHEMA
+
+# question_id: (subject_id, subject_name, topic_id, topic_name, question_type, question_level, question_points)
+QUESTIONS = {
+    1: (1, 'Math', 11, 'Algebra', 'multiple_choice', 'remember', 1.0),
+    2: (1, 'Math', 12, 'Geometry', 'true_or_false', 'apply', 2.0),
+    3: (2, 'Programming', 21, 'Loops', 'coding', 'create', 5.0),
+    4: (2, 'Programming', 22, 'Functions', 'identification', 'apply', 2.0),
+}
+
+# user_id: (course_id, course_abbreviation)
+STUDENTS = {
+    1: (1, 'BSCS'),
+    2: (1, 'BSCS'),
+    3: (1, 'BSCS'),
+    4: (2, 'BSIT'),
+    5: (2, 'BSIT'),
+    6: (2, 'BSIT'),
+}
+
+# (user_id, attempt): points obtained on questions 1..4; users 1 and 4 retook the exam
+SCORES = {
+    (1, 1): (0.0, 2.0, 3.0, 0.0),
+    (1, 2): (1.0, 2.0, 5.0, 2.0),
+    (2, 1): (1.0, 0.0, 2.5, 1.0),
+    (3, 1): (1.0, 2.0, 5.0, 2.0),
+    (4, 1): (0.0, 0.0, 0.0, 0.0),
+    (4, 2): (1.0, 0.0, 4.0, 2.0),
+    (5, 1): (0.0, 2.0, 1.0, 0.0),
+    (6, 1): (1.0, 2.0, 3.0, 1.0),
+}
+
+EXAM_ID = 7
+STARTED_AT = datetime(2025, 3, 1, 8, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def report_frame() -> pl.DataFrame:
+    # student_performances rows of one exam, in the dtypes the report loader produces
+    rows = []
+    for (user_id, attempt), points in SCORES.items():
+        course_id, course_abbreviation = STUDENTS[user_id]
+        for offset, (question_id, points_obtained) in enumerate(zip(QUESTIONS, points)):
+            subject_id, subject_name, topic_id, topic_name, question_type, question_level, question_points = QUESTIONS[question_id]
+            first_viewed_at = STARTED_AT + timedelta(days=attempt, minutes=user_id * 10 + offset)
+            rows.append({
+                'exam_id': EXAM_ID,
+                'user_id': user_id,
+                'attempt': attempt,
+                'student_name': f"Student {user_id}",
+                'student_email': f"student{user_id}@example.com",
+                'course_id': course_id,
+                'course_abbreviation': course_abbreviation,
+                'subject_id': subject_id,
+                'subject_name': subject_name,
+                'topic_id': topic_id,
+                'topic_name': topic_name,
+                'question_id': question_id,
+                'question_name': f"Question {question_id}",
+                'question_type': question_type,
+                'question_level': question_level,
+                'question_points': question_points,
+                'points_obtained': points_obtained,
+                'is_answered': points_obtained > 0 or offset % 2 == 0,
+                'is_correct': points_obtained == question_points,
+                'first_viewed_at': first_viewed_at,
+                'first_answered_at': first_viewed_at + timedelta(seconds=30 + user_id * 5 + offset),
+                'last_answered_at': first_viewed_at + timedelta(seconds=90 + user_id * 7),
+            })
+
+    schema = {column: dtype for column, (_, dtype) in STUDENT_PERFORMANCE_COLUMNS.items()}
+    return pl.DataFrame(rows, schema=schema)
+
+@pytest.fixture
+def student_statuses() -> pl.DataFrame:
+    return pl.DataFrame(
+        [
+            {'user_id': 1, 'attempt': 2, 'status': 'perfect_score'},
+            {'user_id': 2, 'attempt': 1, 'status': 'more_review'},
+            {'user_id': 3, 'attempt': 1, 'status': 'perfect_score'},
+            {'user_id': 4, 'attempt': 2, 'status': 'pass'},
+            {'user_id': 5, 'attempt': 1, 'status': 'more_review'},
+            {'user_id': 6, 'attempt': 1, 'status': 'pass'},
+        ],
+        schema=STUDENT_STATUS_SCHEMA,
+    )
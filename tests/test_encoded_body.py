@@ -0,0 +1,120 @@
+import gzip
+import json
+from decimal import Decimal
+import orjson
+import pytest
+from utils.encoded_body import EncodedBody, ENCODED_BODY_MIN_COMPRESS_BYTES, ENCODING_GZIP, ENCODING_IDENTITY, accepts_gzip, body_etag, encode_default, etag_matches, encoded_response
+
+SMALL_DATA = {'exam_id': 7, 'students': [1, 2, 3]}
+LARGE_DATA = {'rows': [{'user_id': user_id, 'name': f"Student {user_id}"} for user_id in range(ENCODED_BODY_MIN_COMPRESS_BYTES)]}
+
+
+def assert_same_entry(entry: EncodedBody, other: EncodedBody) -> None:
+    assert other.body == entry.body
+    assert other.encoding == entry.encoding
+    assert other.soft_expires_at == entry.soft_expires_at
+    assert other.etag == entry.etag
+
+
+def test_small_body_round_trips_uncompressed():
+    entry = EncodedBody.encode(SMALL_DATA, 123.5)
+    assert entry.encoding == ENCODING_IDENTITY
+
+    restored = EncodedBody.from_redis(entry.to_redis())
+    assert_same_entry(entry, restored)
+    assert restored.decode() == SMALL_DATA
+
+def test_large_body_round_trips_gzipped():
+    entry = EncodedBody.encode(LARGE_DATA, 0)
+    assert entry.encoding == ENCODING_GZIP
+    assert gzip.decompress(entry.body) == orjson.dumps(LARGE_DATA)
+
+    restored = EncodedBody.from_redis(entry.to_redis())
+    assert_same_entry(entry, restored)
+    assert restored.identity_body() == orjson.dumps(LARGE_DATA)
+    assert restored.decode() == LARGE_DATA
+
+def test_etag_hashes_the_uncompressed_body():
+    small = EncodedBody.encode(SMALL_DATA, 0)
+    large = EncodedBody.encode(LARGE_DATA, 0)
+
+    assert small.etag == body_etag(orjson.dumps(SMALL_DATA))
+    assert large.etag == body_etag(orjson.dumps(LARGE_DATA))
+    assert small.etag.startswith('W/"')
+
+def test_given_etag_is_kept():
+    entry = EncodedBody.encode(SMALL_DATA, 0, 'W/"report-7-3"')
+    assert EncodedBody.from_redis(entry.to_redis()).etag == 'W/"report-7-3"'
+
+def test_from_redis_reads_legacy_json_entries():
+    assert EncodedBody.from_redis(None) is None
+
+    wrapped = json.dumps({'soft_expires_at': 50, 'data': SMALL_DATA}).encode()
+    entry = EncodedBody.from_redis(wrapped)
+    assert entry.decode() == SMALL_DATA
+    assert entry.soft_expires_at == 0
+
+    assert EncodedBody.from_redis(json.dumps(SMALL_DATA).encode()).decode() == SMALL_DATA
+
+
+@pytest.mark.parametrize("if_none_match, etag, expected", [
+    ('W/"abc"', 'W/"abc"', True),
+    ('"abc"', 'W/"abc"', True),
+    ('W/"abc"', '"abc"', True),
+    ('"xyz", W/"abc"', 'W/"abc"', True),
+    ('*', 'W/"abc"', True),
+    ('W/"xyz"', 'W/"abc"', False),
+    ('abc', 'W/"abc"', False),
+    ('', 'W/"abc"', False),
+    (None, 'W/"abc"', False),
+])
+def test_etag_matches(if_none_match, etag, expected):
+    assert etag_matches(if_none_match, etag) is expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    (Decimal('3'), 3),
+    (Decimal('1E+2'), 100),
+    (Decimal('2.50'), 2.5),
+    (Decimal('0.0'), 0.0),
+])
+def test_decimals_encode_like_fastapi(value, expected):
+    encoded = encode_default(value)
+    assert encoded == expected
+    assert type(encoded) is type(expected)
+
+def test_decimals_in_body():
+    entry = EncodedBody.encode({'points': Decimal('5'), 'average': Decimal('2.75')}, 0)
+    assert entry.identity_body() == b'{"points":5,"average":2.75}'
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ('gzip', True),
+    ('gzip, deflate, br', True),
+    ('br;q=1.0, GZIP;q=0.5', True),
+    ('x-gzip', True),
+    ('*', True),
+    ('gzip;q=0', False),
+    ('gzip; q=0.0, identity', False),
+    ('*;q=0', False),
+    ('gzip;q=0, *', False),
+    ('deflate, *;q=0.1', True),
+    ('gzip;q=abc', False),
+    ('deflate, br', False),
+    ('identity', False),
+    ('', False),
+    (None, False),
+])
+def test_accepts_gzip(accept_encoding, expected):
+    assert accepts_gzip(accept_encoding) is expected
+
+def test_gzip_refused_with_zero_quality_gets_identity_body():
+    entry = EncodedBody.encode(LARGE_DATA, 0)
+
+    refused = encoded_response(entry, 'gzip;q=0, identity')
+    assert 'content-encoding' not in refused.headers
+    assert refused.body == orjson.dumps(LARGE_DATA)
+
+    accepted = encoded_response(entry, 'gzip;q=0.8')
+    assert accepted.headers['content-encoding'] == ENCODING_GZIP
+    assert accepted.body == entry.body
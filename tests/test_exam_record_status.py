@@ -0,0 +1,39 @@
+import re
+import sqlite3
+import pytest
+from queries.exam_taking_queries import UPDATE_EXAM_RECORDS_QUERY, get_exam_record_status
+
+# (score_obtained, max_score, passing_score)
+STATUS_CASES = [
+    (10, 10, 75),
+    (8, 10, 75),
+    (7.5, 10, 75),
+    (7, 10, 75),
+    (0, 10, 75),
+    (0, 0, 75),
+    (3, 0, 75),
+    (0, 10, 0),
+    (5, 10, 50),
+    (4.99, 10, 50),
+    (2.4, 4, 60),
+    (2.5, 4, 60),
+    (12, 10, 75),
+]
+
+
+def get_status_case() -> str:
+    match = re.search(r"status = (CASE.*?END)", UPDATE_EXAM_RECORDS_QUERY, re.DOTALL)
+    assert match, "status CASE not found in UPDATE_EXAM_RECORDS_QUERY"
+    return match.group(1)
+
+@pytest.mark.parametrize("score_obtained, max_score, passing_score", STATUS_CASES)
+def test_status_case_matches_get_exam_record_status(score_obtained, max_score, passing_score):
+    # the CASE is plain SQL, sqlite evaluates it the way Postgres does for these inputs
+    query = f"""
+        WITH totals(total_score, max_score, passing_score) AS (VALUES (?, ?, ?))
+        SELECT {get_status_case()} FROM totals
+    """
+    with sqlite3.connect(":memory:") as conn:
+        (sql_status,) = conn.execute(query, (score_obtained, max_score, passing_score)).fetchone()
+
+    assert sql_status == get_exam_record_status(score_obtained, max_score, passing_score)
@@ -0,0 +1,145 @@
+import threading
+from types import SimpleNamespace
+import pytest
+from utils import executor_limits
+from utils.executor_limits import AdaptiveLimiter, CircuitBreaker, BREAKER_CLOSED, BREAKER_OPEN, BREAKER_HALF_OPEN
+
+
+class FakeClock():
+    def __init__(self, now: float = 100.0) -> None:
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(executor_limits, 'time', SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def test_limiter_halves_once_per_interval_on_failure(clock):
+    limiter = AdaptiveLimiter('python', max_limit=4, latency_target=5)
+
+    limiter.acquire()
+    limiter.release(0.1, failed=True)
+    assert limiter.limit == 2
+
+    # a burst of failures within one interval is a single signal
+    limiter.acquire()
+    limiter.release(0.1, failed=True)
+    assert limiter.limit == 2
+
+    clock.advance(executor_limits.EXECUTOR_LIMIT_DECREASE_INTERVAL_SECONDS)
+    limiter.acquire()
+    limiter.release(0.1, failed=True)
+    assert limiter.limit == 1
+
+def test_limiter_treats_slow_calls_as_failures_and_keeps_min_limit(clock):
+    limiter = AdaptiveLimiter('python', max_limit=2, min_limit=1, latency_target=5)
+
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(6.0)
+        clock.advance(executor_limits.EXECUTOR_LIMIT_DECREASE_INTERVAL_SECONDS)
+
+    assert limiter.limit == 1
+    assert limiter.in_flight == 0
+
+def test_limiter_grows_back_additively_up_to_max(clock):
+    limiter = AdaptiveLimiter('python', max_limit=3, latency_target=5)
+    limiter.limit = 1.0
+
+    limiter.acquire()
+    limiter.release(0.1)
+    assert limiter.limit == 2
+
+    limiter.acquire()
+    limiter.release(0.1)
+    assert limiter.limit == 2.5
+
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == 3
+
+def test_limiter_blocks_past_the_limit_until_a_release():
+    limiter = AdaptiveLimiter('python', max_limit=1)
+    limiter.acquire()
+
+    acquired = threading.Event()
+    def acquire():
+        limiter.acquire()
+        acquired.set()
+
+    waiter = threading.Thread(target=acquire, daemon=True)
+    waiter.start()
+    assert not acquired.wait(0.1)
+
+    limiter.release(0.1)
+    assert acquired.wait(1)
+    assert limiter.in_flight == 1
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker('python', failure_threshold=3, open_seconds=30)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == BREAKER_OPEN
+    assert breaker.is_open()
+    assert not breaker.allow_request()
+
+def test_breaker_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker('python', failure_threshold=3, open_seconds=30)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.state == BREAKER_CLOSED
+
+def test_breaker_lets_one_probe_through_after_cooling_down(clock):
+    breaker = CircuitBreaker('python', failure_threshold=1, open_seconds=30)
+    breaker.record_failure()
+
+    clock.advance(29)
+    assert breaker.is_open()
+    assert not breaker.allow_request()
+
+    clock.advance(1)
+    assert not breaker.is_open()
+    assert breaker.allow_request()
+    assert breaker.state == BREAKER_HALF_OPEN
+
+    # while the probe is in flight the breaker still turns calls away
+    assert breaker.is_open()
+    assert not breaker.allow_request()
+
+def test_breaker_reopens_on_failed_probe_and_closes_on_good_one(clock):
+    breaker = CircuitBreaker('python', failure_threshold=1, open_seconds=30)
+    breaker.record_failure()
+
+    clock.advance(30)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == BREAKER_OPEN
+    assert breaker.is_open()
+
+    clock.advance(30)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == BREAKER_CLOSED
+    assert breaker.failures == 0
+    assert not breaker.is_open()
+    assert breaker.allow_request()
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+import pytest
+from utils import local_cache
+from utils.local_cache import LocalTTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch) -> SimpleNamespace:
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(local_cache, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_evicts_least_recently_used(clock):
+    cache = LocalTTLCache(max_entries=2, ttl_seconds=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    # reading a makes b the oldest entry
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+def test_overwriting_a_key_does_not_evict(clock):
+    cache = LocalTTLCache(max_entries=2, ttl_seconds=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.set('a', 10)
+
+    assert cache.get('a') == 10
+    assert cache.get('b') == 2
+
+def test_entries_expire_after_ttl(clock):
+    cache = LocalTTLCache(max_entries=2, ttl_seconds=10)
+    cache.set('a', 1)
+
+    clock.now = 9.9
+    assert cache.get('a') == 1
+
+    clock.now = 10.0
+    assert cache.get('a') is None
+
+def test_set_restarts_the_ttl(clock):
+    cache = LocalTTLCache(max_entries=2, ttl_seconds=10)
+    cache.set('a', 1)
+
+    clock.now = 8
+    cache.set('a', 2)
+
+    clock.now = 15
+    assert cache.get('a') == 2
+
+def test_invalidate_by_key_and_prefix(clock):
+    cache = LocalTTLCache(max_entries=10, ttl_seconds=60)
+    cache.set('dashboard:course:1', 1)
+    cache.set('dashboard:course:2', 2)
+    cache.set('dashboard:exam', 3)
+
+    cache.invalidate('dashboard:course:*')
+    assert cache.get('dashboard:course:1') is None
+    assert cache.get('dashboard:course:2') is None
+    assert cache.get('dashboard:exam') == 3
+
+    cache.invalidate('dashboard:exam')
+    cache.invalidate('dashboard:missing')
+    assert cache.get('dashboard:exam') is None
+
+def test_clear_drops_everything(clock):
+    cache = LocalTTLCache(max_entries=10, ttl_seconds=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.clear()
+
+    assert cache.get('a') is None
+    assert cache.get('b') is None
@@ -0,0 +1,59 @@
+import json
+import math
+import legacy_reports_strategy as legacy
+from handlers.reports_interface import Context
+from handlers.reports_strategy import CalculateExamOverview, CalculateExamDescriptiveStatistics, CalculateExamHistogramBoxplot, CalculateExamBySubjectsAndTopics, CalculateExamBYTypeWithLevels, CalculateExamQuestionHeatStrip, CalculateIndividualQuestionAnalysis, CalculateIndividualStudentPerformance
+
+
+def normalize(value):
+    # group_by and unique give no row order guarantee, so lists compare as multisets
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return sorted((normalize(item) for item in value), key=lambda item: json.dumps(item, sort_keys=True, default=str))
+    if isinstance(value, float):
+        return 'nan' if math.isnan(value) else round(value, 9)
+    return value
+
+
+def test_lazy_context_matches_eager_strategies(report_frame, student_statuses):
+    context = Context(
+        exam_id=report_frame['exam_id'][0],
+        strategies=[
+            CalculateExamOverview(),
+            CalculateExamDescriptiveStatistics(),
+            CalculateExamHistogramBoxplot(),
+            CalculateExamBySubjectsAndTopics(),
+            CalculateExamBYTypeWithLevels(),
+            CalculateExamQuestionHeatStrip(),
+            CalculateIndividualQuestionAnalysis(),
+            CalculateIndividualStudentPerformance()
+        ])
+    # frames are handed over directly, nothing is loaded from Postgres
+    context.df = report_frame
+    context.student_statuses = student_statuses
+
+    expected = legacy.do_business_logic(report_frame, [
+        legacy.CalculateExamOverview(),
+        legacy.CalculateExamDescriptiveStatistics(student_statuses),
+        legacy.CalculateExamHistogramBoxplot(),
+        legacy.CalculateExamBySubjectsAndTopics(),
+        legacy.CalculateExamBYTypeWithLevels(),
+        legacy.CalculateExamQuestionHeatStrip(),
+        legacy.CalculateIndividualQuestionAnalysis(),
+        legacy.CalculateIndividualStudentPerformance()
+    ])
+
+    assert normalize(context.do_business_logic()) == normalize(expected)
+
+def test_context_reports_only_latest_attempts(report_frame, student_statuses):
+    context = Context(exam_id=report_frame['exam_id'][0], strategies=[CalculateExamHistogramBoxplot()])
+    context.df = report_frame
+    context.student_statuses = student_statuses
+
+    result = context.do_business_logic()
+    latest = {(row['user_id'], row['attempt']) for row in result['raw_exam_performance']}
+    assert latest == {(1, 2), (2, 1), (3, 1), (4, 2), (5, 1), (6, 1)}
+
+    scores = {row['user_id']: row['total_score'] for row in result['exam_performance']['exam_histogram_boxplot_data']}
+    assert scores == {1: 10.0, 2: 4.5, 3: 10.0, 4: 7.0, 5: 3.0, 6: 7.0}
@@ -0,0 +1,86 @@
+import os
+import queue
+import threading
+import adbc_driver_postgresql.dbapi as adbc_postgresql
+from contextlib import contextmanager
+from psycopg_pool import ConnectionPool
+from utils.database_config import DATABASE_URL
+from utils.logger import logger
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 30))
+DB_POOL_MAX_LIFETIME_SECONDS = float(os.getenv("DB_POOL_MAX_LIFETIME_SECONDS", 1800))
+DB_POOL_MAX_IDLE_SECONDS = float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", 300))
+ARROW_DB_POOL_SIZE = int(os.getenv("ARROW_DB_POOL_SIZE", 4))
+
+# One pool per process, opened on first use so importing never connects
+db_pool = ConnectionPool(
+    DATABASE_URL,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT_SECONDS,
+    max_lifetime=DB_POOL_MAX_LIFETIME_SECONDS,
+    max_idle=DB_POOL_MAX_IDLE_SECONDS,
+    check=ConnectionPool.check_connection,
+    name="app",
+    open=False,
+)
+_open_lock = threading.Lock()
+
+# Idle ADBC connections for Arrow-native reads; result sets arrive as Arrow batches
+# decoded in C instead of Python tuples. Extra connections past the cap are closed.
+arrow_db_connections = queue.LifoQueue(maxsize=ARROW_DB_POOL_SIZE)
+
+
+@contextmanager
+def get_db_connection():
+    # borrowed connections are committed on a clean exit and rolled back on error
+    if db_pool.closed:
+        with _open_lock:
+            if db_pool.closed:
+                db_pool.open()
+                logger.info(f"✅ Opened database pool ({DB_POOL_MIN_SIZE}-{DB_POOL_MAX_SIZE} connections)")
+
+    with db_pool.connection() as conn:
+        yield conn
+
+def check_db_connection() -> None:
+    # raises when no pooled connection can answer, used by the health check
+    with get_db_connection() as conn:
+        conn.execute("SELECT 1")
+
+def get_db_pool_stats() -> dict:
+    # includes requests_wait_ms, requests_queued and connections_num from psycopg_pool
+    return db_pool.get_stats()
+
+def close_db_pool() -> None:
+    if not db_pool.closed:
+        logger.info(f"Closing database pool, stats: {get_db_pool_stats()}")
+        db_pool.close()
+
+@contextmanager
+def get_arrow_db_connection():
+    # read-only use: autocommit keeps idle connections out of open transactions
+    try:
+        conn = arrow_db_connections.get_nowait()
+    except queue.Empty:
+        conn = adbc_postgresql.connect(DATABASE_URL, autocommit=True)
+
+    try:
+        yield conn
+    except Exception:
+        conn.close()
+        raise
+
+    try:
+        arrow_db_connections.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+def close_arrow_db_pool() -> None:
+    while True:
+        try:
+            arrow_db_connections.get_nowait().close()
+        except queue.Empty:
+            return
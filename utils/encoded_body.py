@@ -0,0 +1,133 @@
+import os
+import gzip
+import json
+import hashlib
+import orjson
+from decimal import Decimal
+from fastapi import Response
+
+# Cached response bodies: serialized once with orjson, gzipped when large enough,
+# and stored as  MAGIC + header JSON + newline + body  in Redis.
+# The header also carries the ETag, a hash of the uncompressed body.
+ENCODED_BODY_MAGIC = b"ENC1"
+ENCODED_BODY_MIN_COMPRESS_BYTES = int(os.getenv("ENCODED_BODY_MIN_COMPRESS_BYTES", 1024))
+ENCODED_BODY_COMPRESS_LEVEL = 6
+
+ENCODING_IDENTITY = "identity"
+ENCODING_GZIP = "gzip"
+
+
+def encode_default(value):
+    # numeric columns come back from Postgres as Decimal, sent as FastAPI's decimal_encoder
+    # does: whole values (no fractional digits) as int, everything else as float
+    if isinstance(value, Decimal):
+        if value.as_tuple().exponent >= 0:
+            return int(value)
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def body_etag(body: bytes) -> str:
+    # weak: the gzip and identity representations share one validator
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+class EncodedBody():
+    __slots__ = ('body', 'encoding', 'soft_expires_at', 'etag')
+
+    def __init__(self, body: bytes, encoding: str, soft_expires_at: float, etag: str) -> None:
+        self.body = body
+        self.encoding = encoding
+        self.soft_expires_at = soft_expires_at
+        self.etag = etag
+
+    @classmethod
+    def encode(cls, data, soft_expires_at: float, etag: str = None) -> "EncodedBody":
+        # callers that already know the data version pass it as the ETag, otherwise the body is hashed
+        body = orjson.dumps(data, default=encode_default)
+        etag = etag or body_etag(body)
+        if len(body) >= ENCODED_BODY_MIN_COMPRESS_BYTES:
+            return cls(gzip.compress(body, compresslevel=ENCODED_BODY_COMPRESS_LEVEL), ENCODING_GZIP, soft_expires_at, etag)
+        return cls(body, ENCODING_IDENTITY, soft_expires_at, etag)
+
+    @classmethod
+    def from_redis(cls, value: bytes):
+        if value is None:
+            return None
+
+        if value.startswith(ENCODED_BODY_MAGIC):
+            header, body = value[len(ENCODED_BODY_MAGIC):].split(b"\n", 1)
+            meta = orjson.loads(header)
+            entry = cls(body, meta['encoding'], meta['soft_expires_at'], meta.get('etag'))
+            if entry.etag is None:
+                entry.etag = body_etag(entry.identity_body())
+            return entry
+
+        # plain JSON written by older releases, served once and then rebuilt
+        entry = json.loads(value)
+        if isinstance(entry, dict) and 'soft_expires_at' in entry and 'data' in entry:
+            entry = entry['data']
+        return cls.encode(entry, 0)
+
+    def to_redis(self) -> bytes:
+        header = orjson.dumps({'encoding': self.encoding, 'soft_expires_at': self.soft_expires_at, 'etag': self.etag})
+        return ENCODED_BODY_MAGIC + header + b"\n" + self.body
+
+    def identity_body(self) -> bytes:
+        return gzip.decompress(self.body) if self.encoding == ENCODING_GZIP else self.body
+
+    def decode(self):
+        return orjson.loads(self.identity_body())
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque_tag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque_tag for tag in if_none_match.split(","))
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    # gzip;q=0 refuses gzip, a '*' entry covers gzip when it is not listed itself
+    qualities = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+
+    for coding in (ENCODING_GZIP, "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+def encoded_response(entry: EncodedBody, accept_encoding: str = "", if_none_match: str = "") -> Response:
+    # cached bytes go out as-is; only clients without gzip support cost a decompress
+    if entry is None:
+        return Response(content=b"null", media_type="application/json")
+
+    headers = {'ETag': entry.etag, 'Vary': 'Accept-Encoding'}
+    if etag_matches(if_none_match, entry.etag):
+        return not_modified_response(entry.etag)
+
+    if entry.encoding == ENCODING_GZIP and accepts_gzip(accept_encoding):
+        headers['Content-Encoding'] = ENCODING_GZIP
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+    return Response(content=entry.identity_body(), media_type="application/json", headers=headers)
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, 'Vary': 'Accept-Encoding'})
+
+def conditional_response(request, entry: EncodedBody) -> Response:
+    return encoded_response(entry, request.headers.get('accept-encoding', ''), request.headers.get('if-none-match', ''))
@@ -0,0 +1,177 @@
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+import requests
+from requests.adapters import HTTPAdapter
+from utils.logger import logger
+
+EXECUTOR_CONNECT_TIMEOUT = float(os.getenv("EXECUTOR_CONNECT_TIMEOUT", 3))
+EXECUTOR_READ_TIMEOUT = float(os.getenv("EXECUTOR_READ_TIMEOUT", 60))
+EXECUTOR_POOL_SIZE = int(os.getenv("EXECUTOR_POOL_SIZE", 16))
+
+# Retries per call, and the share of calls that may be retried across the process
+EXECUTOR_MAX_RETRIES = int(os.getenv("EXECUTOR_MAX_RETRIES", 2))
+EXECUTOR_RETRY_BUDGET_RATIO = float(os.getenv("EXECUTOR_RETRY_BUDGET_RATIO", 0.2))
+EXECUTOR_RETRY_BUDGET_MAX = 10.0
+EXECUTOR_BACKOFF_SECONDS = float(os.getenv("EXECUTOR_BACKOFF_SECONDS", 0.5))
+
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+LATENCY_SAMPLES = 500
+
+
+class ExecutorError(Exception):
+    pass
+
+
+class ExecutorClient():
+    """
+    Sends code to the language executors over one pooled keep-alive session
+    per executor URL.
+
+    Connection errors, connect timeouts and 502/503/504 answers are retried
+    with jittered exponential backoff while the shared retry budget allows it.
+    A read timeout is not retried, the executor is already busy with the code.
+    Every failure, retried or not, surfaces as ExecutorError so callers can
+    leave the work pending instead of dropping it.
+    """
+    # results are real executor output, safe to share through the result cache
+    cacheable = True
+
+    def __init__(self, urls: dict, connect_timeout=EXECUTOR_CONNECT_TIMEOUT, read_timeout=EXECUTOR_READ_TIMEOUT,
+                 max_retries=EXECUTOR_MAX_RETRIES, pool_size=EXECUTOR_POOL_SIZE) -> None:
+        self.urls = urls
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._retry_tokens = EXECUTOR_RETRY_BUDGET_MAX
+        self._latencies = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+        self._calls = defaultdict(int)
+        self._errors = defaultdict(int)
+
+    def execute(self, language: str, data: dict) -> dict:
+        url = self.urls.get(language)
+        if not url:
+            raise ValueError(f"No executor URL defined for language: {language}")
+
+        session = self._get_session(url)
+        self._deposit_retry_token()
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = session.post(url, json=data, timeout=self.timeout)
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    raise ExecutorError(f"{url} answered {response.status_code}")
+                if response.status_code >= 500:
+                    response.raise_for_status()
+                result = response.json()
+                self._record_call(url, time.perf_counter() - started)
+                return result
+
+            except (requests.ConnectionError, requests.ConnectTimeout, ExecutorError) as e:
+                self._record_call(url, time.perf_counter() - started, failed=True)
+                if attempt >= self.max_retries or not self._withdraw_retry_token():
+                    raise ExecutorError(f"Executor call to {url} failed after {attempt + 1} attempts") from e
+
+                backoff = EXECUTOR_BACKOFF_SECONDS * (2 ** attempt)
+                delay = random.uniform(0, backoff)
+                logger.warning(f"Executor call to {url} failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+
+            except (requests.RequestException, ValueError) as e:
+                # read timeouts, other 5xx answers and bodies that are not JSON
+                self._record_call(url, time.perf_counter() - started, failed=True)
+                raise ExecutorError(f"Executor call to {url} failed: {e}") from e
+
+            except Exception:
+                self._record_call(url, time.perf_counter() - started, failed=True)
+                raise
+
+    def stats(self) -> dict:
+        # latency summary per executor URL, in milliseconds
+        with self._lock:
+            summary = {}
+            for url, samples in self._latencies.items():
+                ordered = sorted(samples)
+                summary[url] = {
+                    'calls': self._calls[url],
+                    'errors': self._errors[url],
+                    'avg_ms': round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0,
+                    'p95_ms': round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 2) if ordered else 0,
+                }
+            return summary
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def _get_session(self, url: str) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(url)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[url] = session
+            return session
+
+    def _record_call(self, url: str, elapsed: float, failed: bool = False) -> None:
+        with self._lock:
+            self._latencies[url].append(elapsed)
+            self._calls[url] += 1
+            if failed:
+                self._errors[url] += 1
+        logger.info(f"Executor call to {url} took {elapsed * 1000:.1f} ms")
+
+    def _deposit_retry_token(self) -> None:
+        with self._lock:
+            self._retry_tokens = min(EXECUTOR_RETRY_BUDGET_MAX, self._retry_tokens + EXECUTOR_RETRY_BUDGET_RATIO)
+
+    def _withdraw_retry_token(self) -> bool:
+        with self._lock:
+            if self._retry_tokens < 1:
+                return False
+            self._retry_tokens -= 1
+            return True
+
+
+class StubExecutorClient():
+    """
+    Local stand-in for ExecutorClient. Answers every call with
+    result_factory(language, data) without any network call.
+    """
+    # stub results are fake, they must never reach the cache real workers share
+    cacheable = False
+
+    def __init__(self, result_factory=None) -> None:
+        self.result_factory = result_factory or stub_result
+        self.calls = []
+
+    def execute(self, language: str, data: dict) -> dict:
+        self.calls.append((language, data))
+        return self.result_factory(language, data)
+
+    def stats(self) -> dict:
+        return {'stub': {'calls': len(self.calls), 'errors': 0, 'avg_ms': 0, 'p95_ms': 0}}
+
+    def close(self) -> None:
+        pass
+
+
+def stub_result(language: str, data: dict) -> dict:
+    return {
+        'success': True,
+        'testResults': [],
+        'failures': [],
+        'points': [{'syntax': 0, 'runtime': 0, 'testcase': 0}],
+    }
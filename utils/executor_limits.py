@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from utils.logger import logger
+
+# AIMD limiter: grow by about one slot per window of healthy calls, shrink on slow or failed ones
+EXECUTOR_LATENCY_TARGET_SECONDS = float(os.getenv("EXECUTOR_LATENCY_TARGET_SECONDS", 5))
+EXECUTOR_LIMIT_DECREASE_FACTOR = float(os.getenv("EXECUTOR_LIMIT_DECREASE_FACTOR", 0.5))
+EXECUTOR_LIMIT_DECREASE_INTERVAL_SECONDS = 1.0
+
+# Circuit breaker: open after consecutive failures, probe again after a cool down
+EXECUTOR_BREAKER_FAILURE_THRESHOLD = int(os.getenv("EXECUTOR_BREAKER_FAILURE_THRESHOLD", 5))
+EXECUTOR_BREAKER_OPEN_SECONDS = float(os.getenv("EXECUTOR_BREAKER_OPEN_SECONDS", 30))
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class AdaptiveLimiter():
+    """
+    Caps the calls in flight to one executor. The cap starts at max_limit,
+    drops by EXECUTOR_LIMIT_DECREASE_FACTOR when a call fails or is slower than
+    the latency target, and climbs back by one for every `limit` good calls.
+    """
+
+    def __init__(self, name: str, max_limit: int, min_limit: int = 1, latency_target=EXECUTOR_LATENCY_TARGET_SECONDS) -> None:
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.latency_target = latency_target
+
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, failed: bool = False) -> None:
+        with self._condition:
+            self.in_flight -= 1
+
+            if failed or latency > self.latency_target:
+                now = time.monotonic()
+                # one decrease per interval, a burst of slow calls is one signal
+                if now - self._last_decrease >= EXECUTOR_LIMIT_DECREASE_INTERVAL_SECONDS:
+                    self._last_decrease = now
+                    self.limit = max(self.min_limit, self.limit * EXECUTOR_LIMIT_DECREASE_FACTOR)
+                    logger.warning(f"Executor {self.name} limit lowered to {int(self.limit)}")
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            self._condition.notify_all()
+
+
+class CircuitBreaker():
+    def __init__(self, name: str, failure_threshold=EXECUTOR_BREAKER_FAILURE_THRESHOLD, open_seconds=EXECUTOR_BREAKER_OPEN_SECONDS) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        # True while calls are being turned away: open and cooling down, or half open with the probe in flight
+        with self._lock:
+            if self.state == BREAKER_OPEN:
+                return time.monotonic() - self._opened_at < self.open_seconds
+            return self.state == BREAKER_HALF_OPEN and self._probing
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == BREAKER_CLOSED:
+                return True
+
+            if self.state == BREAKER_OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self.state = BREAKER_HALF_OPEN
+                self._probing = False
+
+            # half open: a single probe call decides
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != BREAKER_CLOSED:
+                logger.info(f"Executor {self.name} circuit closed")
+            self.state = BREAKER_CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == BREAKER_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != BREAKER_OPEN:
+                    logger.error(f"Executor {self.name} circuit opened after {self.failures} failures")
+                self.state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
@@ -0,0 +1,72 @@
+import os
+import json
+import time
+import hashlib
+from utils.logger import logger
+from utils.redis_client import redis_client
+
+RESULT_CACHE_PREFIX = "executor_result:"
+RESULT_CACHE_INDEX = "executor_result:index"  # sorted set of cached hashes by last use
+RESULT_CACHE_STATS = "executor_result:stats"
+
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", 86400))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 50000))
+# bump when executor images change their grading, old results are then never read again
+EXECUTOR_RESULT_CACHE_VERSION = os.getenv("EXECUTOR_RESULT_CACHE_VERSION", "1")
+
+# Fields of the executor payload that do not change the result
+RESULT_CACHE_IGNORED_FIELDS = ('request_action',)
+
+
+def get_submission_hash(language: str, executor_url: str, data: dict) -> str:
+    # same executor, language, code and test cases -> same hash, whatever the key order
+    payload = {key: value for key, value in data.items() if key not in RESULT_CACHE_IGNORED_FIELDS}
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    namespace = f"{EXECUTOR_RESULT_CACHE_VERSION}\0{executor_url}\0{language}"
+    return hashlib.sha256(f"{namespace}\0{canonical}".encode()).hexdigest()
+
+def get_cached_result(submission_hash: str):
+    try:
+        cached = redis_client.get(RESULT_CACHE_PREFIX + submission_hash)
+
+        with redis_client.pipeline(transaction=False) as pipe:
+            if cached is None:
+                pipe.hincrby(RESULT_CACHE_STATS, 'misses', 1)
+            else:
+                pipe.hincrby(RESULT_CACHE_STATS, 'hits', 1)
+                pipe.zadd(RESULT_CACHE_INDEX, {submission_hash: time.time()})
+            pipe.execute()
+
+        return json.loads(cached) if cached is not None else None
+
+    except Exception as e:
+        logger.warning(f"Executor result cache read failed for {submission_hash}: {e}")
+        return None
+
+def cache_result(submission_hash: str, result: dict) -> None:
+    if not isinstance(result, dict) or 'success' not in result:
+        return
+
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            pipe.set(RESULT_CACHE_PREFIX + submission_hash, json.dumps(result), ex=RESULT_CACHE_TTL_SECONDS)
+            pipe.zadd(RESULT_CACHE_INDEX, {submission_hash: time.time()})
+            pipe.zcard(RESULT_CACHE_INDEX)
+            entry_count = pipe.execute()[-1]
+
+        if entry_count > RESULT_CACHE_MAX_ENTRIES:
+            evict_least_recently_used(entry_count - RESULT_CACHE_MAX_ENTRIES)
+
+    except Exception as e:
+        logger.warning(f"Executor result cache write failed for {submission_hash}: {e}")
+
+def evict_least_recently_used(count: int) -> None:
+    evicted = redis_client.zpopmin(RESULT_CACHE_INDEX, count)
+    if evicted:
+        redis_client.delete(*[RESULT_CACHE_PREFIX + submission_hash.decode() for submission_hash, _ in evicted])
+        redis_client.hincrby(RESULT_CACHE_STATS, 'evictions', len(evicted))
+
+def get_result_cache_stats() -> dict:
+    stats = {key.decode(): int(value) for key, value in redis_client.hgetall(RESULT_CACHE_STATS).items()}
+    stats['entries'] = redis_client.zcard(RESULT_CACHE_INDEX)
+    return stats
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from utils.logger import logger
+from utils.redis_client import redis_client
+
+
+class LocalTTLCache():
+    """
+    Bounded in-process LRU with a TTL per entry. Sits in front of Redis so hot
+    keys are served from memory; the TTL caps staleness if an invalidation
+    message is missed.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        # a key ending in '*' drops every entry with that prefix
+        with self._lock:
+            if key.endswith('*'):
+                prefix = key[:-1]
+                for cached_key in [cached_key for cached_key in self._entries if cached_key.startswith(prefix)]:
+                    del self._entries[cached_key]
+            else:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def publish_invalidation(channel: str, key: str) -> None:
+    try:
+        redis_client.publish(channel, key)
+    except Exception as e:
+        logger.warning(f"Could not publish invalidation of {key} on {channel}: {e}")
+
+def start_invalidation_listener(channel: str, cache: LocalTTLCache) -> threading.Thread:
+    # every replica drops its local copy when any replica rebuilds a key
+    def listen():
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(channel)
+                # anything published while disconnected was missed
+                cache.clear()
+                for message in pubsub.listen():
+                    cache.invalidate(message['data'].decode())
+            except Exception as e:
+                logger.error(f"Invalidation listener on {channel} failed: {e}", exc_info=True)
+                time.sleep(1)
+
+    thread = threading.Thread(target=listen, daemon=True, name=f"invalidate-{channel}")
+    thread.start()
+    return thread
@@ -1,6 +1,10 @@
 import os
 import redis
+import redis.asyncio
 
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 
 redis_client = redis.Redis(host=REDIS_HOST, port=6379, db=0)
+
+# For async routes, so cache reads do not hold a threadpool worker
+async_redis_client = redis.asyncio.Redis(host=REDIS_HOST, port=6379, db=0)
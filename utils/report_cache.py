@@ -0,0 +1,55 @@
+import os
+from utils.logger import logger
+from utils.redis_client import redis_client
+from utils.encoded_body import EncodedBody
+
+# Computed exam reports, one entry per exam data version. The version combines
+# a counter bumped by grading with a fingerprint of the exam's papers and records
+# (see get_report_data_version), so a report is only recomputed after its exam
+# actually changed; entries of older versions are never read again and expire.
+REPORT_VERSION_PREFIX = "report:version:"
+REPORT_CACHE_PREFIX = "report:exam:"
+REPORT_CACHE_TTL_SECONDS = int(os.getenv("REPORT_CACHE_TTL_SECONDS", 86400))
+
+
+def get_report_cache_key(exam_id: int, version) -> str:
+    return f"{REPORT_CACHE_PREFIX}{exam_id}:v{version}"
+
+def get_report_etag(exam_id: int, version) -> str:
+    # the data version identifies the report body, so clients can revalidate without it being read
+    return f'W/"report-{exam_id}-{version}"'
+
+def get_report_version(exam_id: int) -> int:
+    try:
+        version = redis_client.get(f"{REPORT_VERSION_PREFIX}{exam_id}")
+        return int(version) if version is not None else 0
+    except Exception as e:
+        logger.warning(f"Report version read failed for exam {exam_id}: {e}")
+        return None
+
+def get_cached_report(exam_id: int, version):
+    try:
+        return EncodedBody.from_redis(redis_client.get(get_report_cache_key(exam_id, version)))
+    except Exception as e:
+        logger.warning(f"Report cache read failed for exam {exam_id}: {e}")
+        return None
+
+def cache_report(exam_id: int, version, entry: EncodedBody) -> None:
+    # a version bumped while this report was computed leaves it under the old key, never served
+    try:
+        redis_client.set(get_report_cache_key(exam_id, version), entry.to_redis(), ex=REPORT_CACHE_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Report cache write failed for exam {exam_id}: {e}")
+
+def bump_report_versions(exam_ids) -> None:
+    exam_ids = set(exam_ids)
+    if not exam_ids:
+        return
+
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for exam_id in exam_ids:
+                pipe.incr(f"{REPORT_VERSION_PREFIX}{exam_id}")
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Report version bump failed for exams {exam_ids}: {e}")